@@ -0,0 +1,299 @@
+"""
+Shared ONC RPC / XDR helpers for the NFS test scripts.
+
+The test scripts speak Sun RPC over TCP (RFC 5531) with XDR encoding
+(RFC 4506) against the server on localhost:4000. The helpers here are the
+hot path shared by every script: building record-marked call messages,
+framing replies, and packing/unpacking XDR primitives. All fixed formats
+are precompiled struct.Struct objects so the format strings are parsed
+once per process.
+"""
+
+import os
+import socket
+import struct
+from functools import lru_cache
+
+# Success-path chatter is suppressed unless NFS_TEST_VERBOSE is set, so tight
+# CI loops don't pay stdout lock/encode/flush costs per line. Failure output
+# stays unconditional.
+VERBOSE = bool(os.environ.get("NFS_TEST_VERBOSE"))
+
+
+def vprint(*args, **kwargs):
+    """print() that only emits when NFS_TEST_VERBOSE is set"""
+    if VERBOSE:
+        print(*args, **kwargs)
+
+
+# Precompiled struct formats (compiled once at import, reused for every call)
+U32 = struct.Struct('>I')
+U32_PAIR = struct.Struct('>II')
+U64 = struct.Struct('>Q')
+RPC_CALL_HDR = struct.Struct('>IIIIIIIIII')   # xid..proc + AUTH_NONE cred/verf
+RPC_REPLY_HDR = struct.Struct('>IIIIII')      # xid..accept_stat
+RPC_REPLY_HDR_STATUS = struct.Struct('>IIIIIII')  # header + first result word
+
+# fattr3 (RFC 1813, 84 bytes): type, mode, nlink, uid, gid, size, used,
+# rdev (2 u32), fsid, fileid, atime/mtime/ctime (2 u32 each)
+FATTR3 = struct.Struct('>IIIIIQQIIQQIIIIII')
+
+
+@lru_cache(maxsize=64)
+def _opaque_struct(n):
+    """Cached Struct for an XDR opaque of n bytes: length + data + pad to 4"""
+    return struct.Struct(f'>I{n}s{-n & 3}x')
+
+
+def pack_opaque(data):
+    """Pack variable-length opaque data (length + data + padding) in one call"""
+    return _opaque_struct(len(data)).pack(len(data), data)
+
+
+def pack_string(s):
+    """Pack a string as XDR string"""
+    return pack_opaque(s.encode('utf-8'))
+
+
+def unpack_opaque_flex(data, offset):
+    """Unpack variable-length opaque data (length + data)"""
+    length = U32.unpack_from(data, offset)[0]
+    opaque_data = data[offset+4:offset+4+length]
+    padding = -length & 3
+    next_offset = offset + 4 + length + padding
+    return opaque_data, next_offset
+
+
+def parse_rpc_reply(reply_data):
+    """Parse RPC reply header, return offset to result data"""
+    if len(reply_data) < 24:
+        raise Exception(f"Response too short: {len(reply_data)} bytes")
+
+    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = \
+        RPC_REPLY_HDR.unpack_from(reply_data, 0)
+
+    if reply_stat != 0 or accept_stat != 0:
+        raise Exception(f"RPC error: reply_stat={reply_stat}, accept_stat={accept_stat}")
+
+    return 24  # Return offset to procedure-specific data
+
+
+def parse_rpc_reply_status(reply_data):
+    """Parse RPC reply header fused with the status word that follows it.
+
+    Every *3res (and mountres3) begins with a status u32, so decoding it
+    together with the six header fields saves a second unpack and slice.
+    Returns (offset, status) with offset pointing just past the status word.
+    """
+    if len(reply_data) < 28:
+        raise Exception(f"Response too short: {len(reply_data)} bytes")
+
+    (reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat,
+     status) = RPC_REPLY_HDR_STATUS.unpack_from(reply_data, 0)
+
+    if reply_stat != 0 or accept_stat != 0:
+        raise Exception(f"RPC error: reply_stat={reply_stat}, accept_stat={accept_stat}")
+
+    return 28, status
+
+
+# Raw-socket helpers for the scripts that frame RPC themselves instead of
+# going through RpcClient.
+
+def call_header(prog, vers, proc):
+    """Prebuilt RPC call header template for one procedure.
+
+    Of the ten header words only the XID varies between calls; msg_type,
+    RPC version, program, version, procedure, and the AUTH_NONE cred and
+    verf are packed once and pack_rpc_call stamps the XID in per call.
+    """
+    return bytearray(RPC_CALL_HDR.pack(0, 0, 2, prog, vers, proc, 0, 0, 0, 0))
+
+
+def pack_rpc_call(header, xid):
+    """Stamp xid into a procedure's header template and return the bytes"""
+    U32.pack_into(header, 0, xid)
+    return bytes(header)
+
+
+def build_record(rpc_call, args):
+    """Join marker, header, and args into one record-marked call message"""
+    marker = U32.pack(0x80000000 | (len(rpc_call) + len(args)))
+    return b''.join((marker, rpc_call, args))
+
+
+def send_record(sock, rpc_call, args):
+    """Send one record-marked RPC call with a single sendall.
+
+    The marker, header, and args are joined once, so the kernel sees one
+    write and no intermediate marker+message bytes object is built.
+    """
+    sock.sendall(build_record(rpc_call, args))
+
+
+def recv_record(sock):
+    """Read one record-marked RPC reply, draining short reads.
+
+    sock.recv(n) may legally return fewer bytes than requested, so the
+    4-byte marker and the body are both filled via recv_into loops.
+    """
+    hdr = bytearray(4)
+    mv = memoryview(hdr)
+    got = 0
+    while got < 4:
+        n = sock.recv_into(mv[got:])
+        if not n:
+            raise Exception("Connection closed while reading record marker")
+        got += n
+
+    reply_len = U32.unpack_from(hdr, 0)[0] & 0x7FFFFFFF
+    body = bytearray(reply_len)
+    mv = memoryview(body)
+    got = 0
+    while got < reply_len:
+        n = sock.recv_into(mv[got:])
+        if not n:
+            raise Exception("Connection closed while reading reply body")
+        got += n
+
+    return bytes(body)
+
+
+def skip_wcc_data(reply_data, offset):
+    """Skip a wcc_data structure, returning the offset just past it.
+
+    wcc_data = pre_op_attr (bool + optional 24-byte wcc_attr) followed by
+    post_op_attr (bool + optional 84-byte fattr3). Callers that want the
+    attribute values decode them separately.
+    """
+    pre_follows = U32.unpack_from(reply_data, offset)[0]
+    offset += 4 + (24 if pre_follows else 0)
+    post_follows = U32.unpack_from(reply_data, offset)[0]
+    return offset + 4 + (84 if post_follows else 0)
+
+
+# The root handle of a stable export never changes, so MOUNT results are
+# cached per (server address, export path) and reused across subtests —
+# each extra MOUNT was a full round trip for a value already in hand.
+_root_handle_cache = {}
+
+
+def get_root_handle(client, export, xid):
+    """MOUNT export through client and return its root handle, cached.
+
+    Raises on MOUNT failure; the xid is only used when the cache misses.
+    """
+    key = (client.addr, export)
+    handle = _root_handle_cache.get(key)
+    if handle is None:
+        reply_data = client.call(xid, 100005, 3, 1, pack_string(export))
+        offset, status = parse_rpc_reply_status(reply_data)
+        if status != 0:
+            raise Exception(f"MOUNT failed with status {status}")
+        handle, _ = unpack_opaque_flex(reply_data, offset)
+        _root_handle_cache[key] = handle
+    return handle
+
+
+class RpcClient:
+    """Persistent RPC connection with record-marking framing.
+
+    Holds one TCP connection for the lifetime of a test so the handshake
+    and slow-start costs are paid once, not per procedure call.
+    """
+
+    def __init__(self, host, port, timeout=5.0):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        # Small request/reply traffic: disable Nagle and allow a large
+        # in-flight window
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 256 * 1024)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 256 * 1024)
+        sock.connect((host, port))
+        self.sock = sock
+        self.addr = (host, port)
+        # Receive-side record buffer: one large recv_into per syscall, records
+        # are parsed out of the accumulated bytes (instead of one 4-byte recv
+        # for the marker plus a recv loop for the body of every record).
+        self._rbuf = bytearray()
+        self._tmp = bytearray(65536)
+        # Send-side header buffer reused across calls: marker + 40-byte RPC
+        # call header are packed in place, so a call allocates nothing but
+        # its args (the receive side already reuses _tmp the same way).
+        self._hdr = bytearray(44)
+
+    @staticmethod
+    def build(xid, prog, vers, proc, args_data):
+        """Build one record-marked RPC call message"""
+        # RPC call header: xid, msg_type=CALL, RPC version, prog, vers, proc,
+        # cred (AUTH_NONE flavor + length), verf (AUTH_NONE flavor + length)
+        message = RPC_CALL_HDR.pack(xid, 0, 2, prog, vers, proc, 0, 0, 0, 0)
+
+        # Add procedure arguments
+        call_msg = message + args_data
+
+        # Add RPC record marking
+        msg_len = len(call_msg)
+        record_header = U32.pack(0x80000000 | msg_len)
+
+        return record_header + call_msg
+
+    def send(self, xid, prog, vers, proc, args_data):
+        """Send one record-marked RPC call"""
+        # Scatter-gather send: hand the kernel the marker + RPC header (packed
+        # into the connection's reusable buffer) and the args as an iovec
+        # instead of concatenating them in user space
+        hdr = self._hdr
+        U32.pack_into(hdr, 0, 0x80000000 | (40 + len(args_data)))
+        RPC_CALL_HDR.pack_into(hdr, 4, xid, 0, 2, prog, vers, proc, 0, 0, 0, 0)
+        self._sendmsg([hdr, args_data])
+
+    def _sendmsg(self, buffers):
+        """sendall semantics for a list of buffers (sendmsg may send short)"""
+        bufs = [memoryview(b) for b in buffers if len(b)]
+        while bufs:
+            sent = self.sock.sendmsg(bufs)
+            while sent > 0:
+                if sent >= len(bufs[0]):
+                    sent -= len(bufs[0])
+                    bufs.pop(0)
+                else:
+                    bufs[0] = bufs[0][sent:]
+                    sent = 0
+
+    def flush(self, calls):
+        """Send several calls as one record-marked batch with a single sendall.
+
+        Each element of calls is an (xid, prog, vers, proc, args_data) tuple.
+        Pairs with recv(): drain one reply per call and match them by XID.
+        """
+        self.sock.sendall(b''.join(self.build(*call) for call in calls))
+
+    def recv(self):
+        """Receive one record-marked RPC reply"""
+        buf = self._rbuf
+        # Need the 4-byte record marker first, then the full record body.
+        # Each recv_into reads optimistically (up to 64 KiB), so a small
+        # reply usually costs a single syscall including its marker.
+        while True:
+            if len(buf) >= 4:
+                reply_len = U32.unpack_from(buf, 0)[0] & 0x7FFFFFFF
+                if len(buf) >= 4 + reply_len:
+                    break
+            n = self.sock.recv_into(self._tmp, 65536)
+            if n == 0:
+                raise Exception("Connection closed while reading reply")
+            buf += memoryview(self._tmp)[:n]
+
+        reply_data = bytes(buf[4:4 + reply_len])
+        del buf[:4 + reply_len]
+        return reply_data
+
+    def call(self, xid, prog, vers, proc, args_data):
+        """Make an RPC call and return the response"""
+        self.send(xid, prog, vers, proc, args_data)
+        return self.recv()
+
+    def close(self):
+        self.sock.close()
@@ -4,77 +4,30 @@ Test: NFS FSINFO Response Format Debug
 Purpose: Debug FSINFO response format to identify parsing issues
 """
 
-import socket
 import struct
 import sys
 
-
-def pack_string(s):
-    """Pack a string as XDR string"""
-    data = s.encode('utf-8')
-    length = len(data)
-    padding = (4 - (length % 4)) % 4
-    return struct.pack('>I', length) + data + b'\x00' * padding
-
-
-def unpack_opaque_flex(data, offset):
-    """Unpack variable-length opaque data (length + data)"""
-    length = struct.unpack('>I', data[offset:offset+4])[0]
-    opaque_data = data[offset+4:offset+4+length]
-    padding = (4 - (length % 4)) % 4
-    next_offset = offset + 4 + length + padding
-    return opaque_data, next_offset
-
-
-def rpc_call(host, port, xid, prog, vers, proc, args_data):
-    """Make an RPC call and return the response"""
-    # Build RPC call header
-    message = b''
-    message += struct.pack('>I', xid)      # XID
-    message += struct.pack('>I', 0)        # msg_type = CALL (0)
-    message += struct.pack('>I', 2)        # RPC version
-    message += struct.pack('>I', prog)     # Program
-    message += struct.pack('>I', vers)     # Version
-    message += struct.pack('>I', proc)     # Procedure
-    # cred (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-    # verf (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-
-    # Add procedure arguments
-    call_msg = message + args_data
-
-    # Add RPC record marking
-    msg_len = len(call_msg)
-    record_header = struct.pack('>I', 0x80000000 | msg_len)
-
-    # Connect and send
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(5.0)
-    sock.connect((host, port))
-    sock.sendall(record_header + call_msg)
-
-    # Receive response
-    reply_header_bytes = sock.recv(4)
-    if len(reply_header_bytes) != 4:
-        sock.close()
-        raise Exception("Failed to read response header")
-
-    reply_header = struct.unpack('>I', reply_header_bytes)[0]
-    reply_len = reply_header & 0x7FFFFFFF
-
-    # Read response data
-    reply_data = b''
-    while len(reply_data) < reply_len:
-        chunk = sock.recv(reply_len - len(reply_data))
-        if not chunk:
-            break
-        reply_data += chunk
-
-    sock.close()
-    return reply_data
+from _rpc import (
+    FATTR3, RPC_REPLY_HDR, U32, U64, RpcClient,
+    pack_opaque, pack_string, unpack_opaque_flex,
+)
+
+# FSINFO3resok tail after post_op_attr: 7 u32 transfer fields, maxfilesize (u64),
+# time_delta (2 u32), properties (u32) — parsed in a single call
+_FSINFO = struct.Struct('>IIIIIIIQIII')
+_FSINFO_NAMES = (
+    'rtmax', 'rtpref', 'rtmult',
+    'wtmax', 'wtpref', 'wtmult',
+    'dtpref', 'maxfilesize',
+    'time_delta.seconds', 'time_delta.nseconds',
+    'properties',
+)
+
+# Maps non-printable bytes to '.' for the ASCII column of hex dumps
+_ASCII_TBL = bytes.maketrans(
+    bytes(range(256)),
+    bytes(b if 32 <= b < 127 else 0x2E for b in range(256))
+)
 
 
 def hex_dump(data, offset=0, length=None):
@@ -82,11 +35,15 @@ def hex_dump(data, offset=0, length=None):
     if length is None:
         length = len(data) - offset
 
-    print(f"  Hex dump (offset {offset}, length {length}):")
+    # Accumulate lines and flush once: one stdout write instead of one per row
+    out = [f"  Hex dump (offset {offset}, length {length}):\n"]
+    append = out.append
     for i in range(0, length, 16):
-        hex_str = ' '.join(f'{b:02x}' for b in data[offset+i:offset+i+16])
-        ascii_str = ''.join(chr(b) if 32 <= b < 127 else '.' for b in data[offset+i:offset+i+16])
-        print(f"    {offset+i:04x}: {hex_str:<48} {ascii_str}")
+        row = bytes(data[offset+i:offset+i+16])
+        hex_str = row.hex(' ')
+        ascii_str = row.translate(_ASCII_TBL).decode('ascii')
+        append(f"    {offset+i:04x}: {hex_str:<48} {ascii_str}\n")
+    sys.stdout.write(''.join(out))
 
 
 def test_fsinfo_format():
@@ -99,13 +56,16 @@ def test_fsinfo_format():
     host = "localhost"
     port = 4000
 
+    # One connection for every RPC in the test (MOUNT, FSINFO)
+    client = RpcClient(host, port)
+
     # Step 1: MOUNT to get root handle
     print("Step 1: MOUNT /")
     print("-" * 70)
     mount_xid = 600001
     mount_args = pack_string("/")
 
-    reply_data = rpc_call(host, port, mount_xid, 100005, 3, 1, mount_args)
+    reply_data = client.call(mount_xid, 100005, 3, 1, mount_args)
 
     print(f"  MOUNT response length: {len(reply_data)} bytes")
 
@@ -114,9 +74,8 @@ def test_fsinfo_format():
         print(f"  ✗ Response too short: {len(reply_data)} bytes")
         sys.exit(1)
 
-    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = struct.unpack(
-        '>IIIIII', reply_data[:24]
-    )
+    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = \
+        RPC_REPLY_HDR.unpack_from(reply_data, 0)
 
     print(f"  RPC reply: xid={reply_xid}, msg_type={msg_type}, reply_stat={reply_stat}, accept_stat={accept_stat}")
 
@@ -125,7 +84,7 @@ def test_fsinfo_format():
         sys.exit(1)
 
     offset = 24
-    mount_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    mount_status = U32.unpack_from(reply_data, offset)[0]
     if mount_status != 0:
         print(f"  ✗ MOUNT failed with status {mount_status}")
         sys.exit(1)
@@ -141,16 +100,13 @@ def test_fsinfo_format():
     fsinfo_xid = 600002
 
     # FSINFO3args: fhandle3 (fsroot)
-    fsinfo_args = b''
-    fsinfo_args += struct.pack('>I', len(root_fhandle)) + root_fhandle
-    padding = (4 - (len(root_fhandle) % 4)) % 4
-    fsinfo_args += b'\x00' * padding
+    fsinfo_args = pack_opaque(root_fhandle)
 
     print(f"  FSINFO args length: {len(fsinfo_args)} bytes")
     print(f"  FSINFO args (hex): {fsinfo_args.hex()}")
     print()
 
-    reply_data = rpc_call(host, port, fsinfo_xid, 100003, 3, 19, fsinfo_args)
+    reply_data = client.call(fsinfo_xid, 100003, 3, 19, fsinfo_args)
 
     print(f"  FSINFO response length: {len(reply_data)} bytes")
     print()
@@ -165,9 +121,8 @@ def test_fsinfo_format():
         print(f"    ✗ Response too short: {len(reply_data)} bytes")
         sys.exit(1)
 
-    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = struct.unpack(
-        '>IIIIII', reply_data[:24]
-    )
+    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = \
+        RPC_REPLY_HDR.unpack_from(reply_data, 0)
 
     print(f"    xid:         {reply_xid}")
     print(f"    msg_type:    {msg_type}")
@@ -189,7 +144,7 @@ def test_fsinfo_format():
         print(f"    ✗ Not enough data for NFS status")
         sys.exit(1)
 
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    nfs_status = U32.unpack_from(reply_data, offset)[0]
     print(f"    NFS status: {nfs_status} (0=NFS3_OK)")
     offset += 4
 
@@ -203,7 +158,7 @@ def test_fsinfo_format():
         print(f"    ✗ Not enough data for post_op_attr discriminator")
         sys.exit(1)
 
-    attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    attr_follows = U32.unpack_from(reply_data, offset)[0]
     print(f"    attr_follows: {attr_follows} (1=TRUE, 0=FALSE)")
     offset += 4
 
@@ -214,45 +169,28 @@ def test_fsinfo_format():
             print(f"    ✗ Not enough data for fattr3 (need 84 bytes, have {len(reply_data) - offset})")
             sys.exit(1)
 
-        # Just skip fattr3 for now
         hex_dump(reply_data, offset, 84)
-        offset += 84
-        print(f"    ✓ Skipped fattr3 (84 bytes)")
+        fattr = FATTR3.unpack_from(reply_data, offset)
+        offset += FATTR3.size
+        print(f"    ✓ Parsed fattr3 (84 bytes): type={fattr[0]}, mode={fattr[1]:#o}, size={fattr[5]}")
         print()
 
-    # Parse FSINFO fields
+    # Parse FSINFO fields in one precompiled Struct call
     print(f"  Parsing FSINFO fields (offset={offset}):")
 
-    fields = [
-        ("rtmax", 4),
-        ("rtpref", 4),
-        ("rtmult", 4),
-        ("wtmax", 4),
-        ("wtpref", 4),
-        ("wtmult", 4),
-        ("dtpref", 4),
-        ("maxfilesize", 8),
-        ("time_delta.seconds", 4),
-        ("time_delta.nseconds", 4),
-        ("properties", 4),
-    ]
-
-    values = {}
-    for field_name, field_size in fields:
-        if len(reply_data) < offset + field_size:
-            print(f"    ✗ Not enough data for {field_name} (need {field_size} bytes, have {len(reply_data) - offset})")
-            print(f"    Remaining data ({len(reply_data) - offset} bytes):")
-            hex_dump(reply_data, offset, len(reply_data) - offset)
-            sys.exit(1)
+    if len(reply_data) < offset + _FSINFO.size:
+        print(f"    ✗ Not enough data for FSINFO fields (need {_FSINFO.size} bytes, have {len(reply_data) - offset})")
+        print(f"    Remaining data ({len(reply_data) - offset} bytes):")
+        hex_dump(reply_data, offset, len(reply_data) - offset)
+        sys.exit(1)
 
-        if field_size == 4:
-            value = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        elif field_size == 8:
-            value = struct.unpack('>Q', reply_data[offset:offset+8])[0]
+    values = dict(zip(_FSINFO_NAMES, _FSINFO.unpack_from(reply_data, offset)))
+    offset += _FSINFO.size
 
-        values[field_name] = value
-        print(f"    {field_name:20} = {value:#x} ({value})")
-        offset += field_size
+    sys.stdout.write(''.join(
+        f"    {field_name:20} = {value:#x} ({value})\n"
+        for field_name, value in values.items()
+    ))
 
     print()
     print(f"  ✓ Successfully parsed all FSINFO fields!")
@@ -260,6 +198,8 @@ def test_fsinfo_format():
     print(f"  Total response length: {len(reply_data)}")
     print()
 
+    client.close()
+
     # Summary
     print("=" * 70)
     print("✅ FSINFO RESPONSE FORMAT IS CORRECT!")
@@ -10,16 +10,14 @@ This test validates:
 """
 
 import socket
-import struct
 import sys
 
+from _rpc import RPC_REPLY_HDR, U32, RpcClient, pack_opaque
+
 
 def pack_fhandle3(handle_bytes):
     """Pack a file handle as fhandle3 (variable-length opaque)"""
-    length = len(handle_bytes)
-    # XDR variable-length opaque: length + data + padding
-    padding = (4 - (length % 4)) % 4
-    return struct.pack('>I', length) + handle_bytes + b'\x00' * padding
+    return pack_opaque(handle_bytes)
 
 
 def test_nfs_getattr():
@@ -41,64 +39,20 @@ def test_nfs_getattr():
     print()
 
     try:
-        # Build RPC call header for NFS GETATTR
-        message = b''
-        message += struct.pack('>I', xid)      # XID
-        message += struct.pack('>I', 0)        # msg_type = CALL (0)
-        message += struct.pack('>I', 2)        # RPC version
-        message += struct.pack('>I', 100003)   # Program (NFS)
-        message += struct.pack('>I', 3)        # Version (NFSv3)
-        message += struct.pack('>I', 1)        # Procedure (GETATTR)
-        # cred (AUTH_NONE)
-        message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-        message += struct.pack('>I', 0)        # length = 0
-        # verf (AUTH_NONE)
-        message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-        message += struct.pack('>I', 0)        # length = 0
-
         # GETATTR3args: just a file handle (fhandle3)
         # For now, use a dummy file handle - in real test we'd get this from MOUNT
         # The server's root handle is generated from SHA256 of "/", let's use a simple test handle
         test_handle = b"test_root_handle"
         getattr_args = pack_fhandle3(test_handle)
 
-        call_msg = message + getattr_args
-
-        # Add RPC record marking
-        msg_len = len(call_msg)
-        record_header = struct.pack('>I', 0x80000000 | msg_len)
-
         # Connect and send
         print("Sending NFS GETATTR request...")
         print(f"  File handle: {test_handle} ({len(test_handle)} bytes)")
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(5.0)
-        sock.connect((host, port))
-        sock.sendall(record_header + call_msg)
+        client = RpcClient(host, port)
 
-        # Receive response
         print("Waiting for response...")
-        reply_header_bytes = sock.recv(4)
-        if len(reply_header_bytes) != 4:
-            print("  ✗ Failed to read response header")
-            sock.close()
-            sys.exit(1)
-
-        reply_header = struct.unpack('>I', reply_header_bytes)[0]
-        is_last = (reply_header & 0x80000000) != 0
-        reply_len = reply_header & 0x7FFFFFFF
-
-        print(f"  Response header: is_last={is_last}, length={reply_len}")
-
-        # Read response data
-        reply_data = b''
-        while len(reply_data) < reply_len:
-            chunk = sock.recv(reply_len - len(reply_data))
-            if not chunk:
-                break
-            reply_data += chunk
-
-        sock.close()
+        reply_data = client.call(xid, 100003, 3, 1, getattr_args)
+        client.close()
 
         print(f"  Received {len(reply_data)} bytes")
 
@@ -108,9 +62,8 @@ def test_nfs_getattr():
             print(f"  ✗ Response too short: {len(reply_data)} bytes")
             sys.exit(1)
 
-        reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = struct.unpack(
-            '>IIIIII', reply_data[:24]
-        )
+        reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = \
+            RPC_REPLY_HDR.unpack_from(reply_data, 0)
 
         print(f"  Reply XID: {reply_xid}")
         print(f"  Reply stat: {reply_stat} (0=MSG_ACCEPTED)")
@@ -140,7 +93,7 @@ def test_nfs_getattr():
             print(f"  ✗ No NFS result data")
             sys.exit(1)
 
-        nfs_status = struct.unpack('>I', reply_data[20:24])[0]
+        nfs_status = U32.unpack_from(reply_data, 20)[0]
         print(f"  NFS status: {nfs_status} (0=NFS3_OK)")
 
         if nfs_status == 0:
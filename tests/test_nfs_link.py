@@ -9,50 +9,127 @@ import socket
 import struct
 import sys
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Precompiled parse formats (compiled once at import, reused for every reply)
+_RPC_REPLY_HDR = struct.Struct('>IIIIII')   # xid..accept_stat
+_RPC_REPLY_WITH_STATUS = struct.Struct('>IIIIIII')  # reply header + nfsstat3
+_FATTR3_HEAD = struct.Struct('>IIIIIQ')     # ftype, mode, nlink, uid, gid, size
+_WCC_ATTR = struct.Struct('>QIIII')         # size, mtime, ctime
+
+# Precompiled pack formats for the XDR argument builders
+_U32 = struct.Struct('>I')
+_U32x2 = struct.Struct('>II')
+_U32Q = struct.Struct('>IQ')
+_U32x3 = struct.Struct('>III')
+_RPC_CALL_HDR = struct.Struct('>IIIIIIIIII')   # xid..proc + cred/verf flavor+length
+
+# Progress chatter is suppressed unless NFS_TEST_VERBOSE is set, so CI runs
+# and microbench loops don't pay stdio lock/encode/flush per line. Errors and
+# the per-test pass/fail verdicts stay unconditional.
+VERBOSE = bool(os.environ.get("NFS_TEST_VERBOSE"))
+log = print if VERBOSE else (lambda *a, **k: None)
+
+
+def _sendmsg_all(sock, buffers):
+    """sendall semantics for a list of buffers (sendmsg may send short)"""
+    bufs = [memoryview(b) for b in buffers if len(b)]
+    while bufs:
+        sent = sock.sendmsg(bufs)
+        while sent > 0:
+            if sent >= len(bufs[0]):
+                sent -= len(bufs[0])
+                bufs.pop(0)
+            else:
+                bufs[0] = bufs[0][sent:]
+                sent = 0
+
+
+def send_call(conn, rpc_header, args_data):
+    """Send one record-marked RPC call as a scatter-gather write.
+
+    sendmsg hands the kernel the marker, header, and args as an iovec
+    (writev), so no concatenated frame is built in user space. Platforms
+    without sendmsg fall back to one joined sendall.
+    """
+    marker = _U32.pack(0x80000000 | (len(rpc_header) + len(args_data)))
+    if hasattr(conn.sock, "sendmsg"):
+        _sendmsg_all(conn.sock, [marker, rpc_header, args_data])
+    else:
+        conn.sock.sendall(marker + rpc_header + args_data)
+
+
+class RpcConn:
+    """TCP connection with buffered record-marking reads.
+
+    recv_record() fills an internal bytearray with one large recv_into per
+    syscall and slices complete records out of it, instead of one 4-byte
+    recv for the marker plus a recv for the body. This also fixes the
+    short-read bug of a bare sock.recv(response_len), which may legally
+    return fewer bytes than requested.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._buf = bytearray()
+        self._tmp = bytearray(65536)
+
+    def recv_record(self):
+        """Receive one complete record-marked RPC reply"""
+        buf = self._buf
+        while True:
+            if len(buf) >= 4:
+                reply_len = _U32.unpack_from(buf, 0)[0] & 0x7FFFFFFF
+                if len(buf) >= 4 + reply_len:
+                    break
+            n = self.sock.recv_into(self._tmp, 65536)
+            if n == 0:
+                raise Exception("Connection closed while reading reply")
+            buf += memoryview(self._tmp)[:n]
+
+        reply_data = bytes(buf[4:4 + reply_len])
+        del buf[:4 + reply_len]
+        # Hand parsers a memoryview so their offset slicing stays zero-copy;
+        # only extracted file handles get materialized as bytes.
+        return memoryview(reply_data)
 
 
 def pack_rpc_call(xid, prog, vers, proc, auth_flavor=0, auth_len=0, verf_flavor=0, verf_len=0):
-    """Pack RPC call header"""
-    # RPC header (28 bytes base)
-    rpc_header = struct.pack(
-        '>IIIIIIII',
+    """Pack RPC call header (xid..proc + credential + verifier, 40 bytes)"""
+    return _RPC_CALL_HDR.pack(
         xid,         # XID
         0,           # Message type (0 = CALL)
         2,           # RPC version
         prog,        # Program
         vers,        # Version
         proc,        # Procedure
-        auth_flavor, # Auth flavor
-        auth_len     # Auth length
+        auth_flavor, # Cred flavor
+        auth_len,    # Cred length
+        verf_flavor, # Verf flavor
+        verf_len     # Verf length
     )
 
-    # Add verifier
-    verf = struct.pack('>II', verf_flavor, verf_len)
-
-    return rpc_header + verf
-
 
 def pack_fhandle3(handle):
     """Pack file handle (length + data + padding)"""
-    handle_len = len(handle)
-    packed = struct.pack('>I', handle_len)
-    packed += handle
-    # Add padding to 4-byte boundary
-    padding = (4 - (handle_len % 4)) % 4
-    packed += b'\x00' * padding
-    return packed
+    n = len(handle)
+    # Single zero-filled allocation; -n & 3 pads to the 4-byte boundary
+    # without div/mod and the pad bytes are already zero
+    buf = bytearray(4 + n + (-n & 3))
+    _U32.pack_into(buf, 0, n)
+    buf[4:4+n] = handle
+    return bytes(buf)
 
 
 def pack_filename3(name):
     """Pack filename (length + string + padding)"""
-    name_bytes = name.encode('utf-8')
-    name_len = len(name_bytes)
-    packed = struct.pack('>I', name_len)
-    packed += name_bytes
-    # Add padding to 4-byte boundary
-    padding = (4 - (name_len % 4)) % 4
-    packed += b'\x00' * padding
-    return packed
+    data = name.encode('utf-8')
+    n = len(data)
+    buf = bytearray(4 + n + (-n & 3))
+    _U32.pack_into(buf, 0, n)
+    buf[4:4+n] = data
+    return bytes(buf)
 
 
 def pack_sattr3(mode=None, uid=None, gid=None, size=None, atime_set=False, mtime_set=False):
@@ -62,58 +139,74 @@ def pack_sattr3(mode=None, uid=None, gid=None, size=None, atime_set=False, mtime
     Each field is a union discriminated by a boolean:
     - False (0) = don't set
     - True (1) = set to following value
+
+    Packed directly into one preallocated bytearray (worst case 60 bytes)
+    instead of growing an immutable bytes object per field.
     """
-    packed = b''
+    buf = bytearray(60)
+    off = 0
 
     # mode (set_mode3 union)
     if mode is not None:
-        packed += struct.pack('>II', 1, mode)  # SET_MODE discriminator (1) + mode value
+        _U32x2.pack_into(buf, off, 1, mode)  # SET_MODE discriminator (1) + mode value
+        off += 8
     else:
-        packed += struct.pack('>I', 0)  # DONT_SET_MODE discriminator (0)
+        _U32.pack_into(buf, off, 0)  # DONT_SET_MODE discriminator (0)
+        off += 4
 
     # uid (set_uid3 union)
     if uid is not None:
-        packed += struct.pack('>II', 1, uid)
+        _U32x2.pack_into(buf, off, 1, uid)
+        off += 8
     else:
-        packed += struct.pack('>I', 0)
+        _U32.pack_into(buf, off, 0)
+        off += 4
 
     # gid (set_gid3 union)
     if gid is not None:
-        packed += struct.pack('>II', 1, gid)
+        _U32x2.pack_into(buf, off, 1, gid)
+        off += 8
     else:
-        packed += struct.pack('>I', 0)
+        _U32.pack_into(buf, off, 0)
+        off += 4
 
     # size (set_size3 union)
     if size is not None:
-        packed += struct.pack('>IQ', 1, size)
+        _U32Q.pack_into(buf, off, 1, size)
+        off += 12
     else:
-        packed += struct.pack('>I', 0)
+        _U32.pack_into(buf, off, 0)
+        off += 4
 
     # atime (set_atime union)
     if atime_set:
         # SET_TO_CLIENT_TIME (1) + nfstime3 (seconds + nseconds)
-        packed += struct.pack('>III', 1, 0, 0)
+        _U32x3.pack_into(buf, off, 1, 0, 0)
+        off += 12
     else:
-        packed += struct.pack('>I', 0)  # DONT_CHANGE
+        _U32.pack_into(buf, off, 0)  # DONT_CHANGE
+        off += 4
 
     # mtime (set_mtime union)
     if mtime_set:
-        packed += struct.pack('>III', 1, 0, 0)
+        _U32x3.pack_into(buf, off, 1, 0, 0)
+        off += 12
     else:
-        packed += struct.pack('>I', 0)
+        _U32.pack_into(buf, off, 0)
+        off += 4
 
-    return packed
+    return bytes(buf[:off])
 
 
 def pack_create3args(dir_handle, filename, mode=0o644):
     """Pack CREATE3args structure"""
-    packed = pack_fhandle3(dir_handle)
-    packed += pack_filename3(filename)
+    buf = bytearray(pack_fhandle3(dir_handle))
+    buf += pack_filename3(filename)
     # createmode3: UNCHECKED (0)
-    packed += struct.pack('>I', 0)
+    buf += _U32.pack(0)
     # sattr3
-    packed += pack_sattr3(mode=mode)
-    return packed
+    buf += pack_sattr3(mode=mode)
+    return bytes(buf)
 
 
 def pack_link3args(file_handle, dir_handle, name):
@@ -126,22 +219,23 @@ def pack_link3args(file_handle, dir_handle, name):
         filename3 name;      // new link name
     }
     """
-    packed = pack_fhandle3(file_handle)
-    packed += pack_fhandle3(dir_handle)
-    packed += pack_filename3(name)
-    return packed
+    buf = bytearray(pack_fhandle3(file_handle))
+    buf += pack_fhandle3(dir_handle)
+    buf += pack_filename3(name)
+    return bytes(buf)
 
 
 def parse_post_op_fh3(reply_data, offset):
     """Parse post_op_fh3 (optional file handle)"""
-    handle_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    handle_follows = _U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     if handle_follows:
-        handle_len = struct.unpack('>I', reply_data[offset:offset+4])[0]
+        handle_len = _U32.unpack_from(reply_data, offset)[0]
         offset += 4
-        handle = reply_data[offset:offset+handle_len]
-        padding = (4 - (handle_len % 4)) % 4
+        # Copy the handle out of the reply view; it outlives this parse
+        handle = bytes(reply_data[offset:offset+handle_len])
+        padding = -handle_len & 3
         offset += handle_len + padding
         return handle, offset
     else:
@@ -150,7 +244,7 @@ def parse_post_op_fh3(reply_data, offset):
 
 def parse_post_op_attr(reply_data, offset):
     """Parse post_op_attr (optional fattr3)"""
-    attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    attr_follows = _U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     if attr_follows:
@@ -161,9 +255,7 @@ def parse_post_op_attr(reply_data, offset):
         # - atime (8) + mtime (8) + ctime (8)
 
         # We're interested in nlink (number of hard links)
-        ftype = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        mode = struct.unpack('>I', reply_data[offset+4:offset+8])[0]
-        nlink = struct.unpack('>I', reply_data[offset+8:offset+12])[0]
+        ftype, mode, nlink, uid, gid, size = _FATTR3_HEAD.unpack_from(reply_data, offset)
 
         offset += 84
         return True, nlink, offset
@@ -183,20 +275,17 @@ def parse_wcc_data(reply_data, offset):
     start_offset = offset
 
     # Parse pre_op_attr
-    pre_attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    pre_attr_follows = _U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     if pre_attr_follows:
         # wcc_attr = 24 bytes (size:8 + mtime:8 + ctime:8)
-        size = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-        offset += 8
-        mtime_sec, mtime_nsec = struct.unpack('>II', reply_data[offset:offset+8])
-        offset += 8
-        ctime_sec, ctime_nsec = struct.unpack('>II', reply_data[offset:offset+8])
-        offset += 8
+        size, mtime_sec, mtime_nsec, ctime_sec, ctime_nsec = \
+            _WCC_ATTR.unpack_from(reply_data, offset)
+        offset += 24
 
     # Parse post_op_attr
-    post_attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    post_attr_follows = _U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     if post_attr_follows:
@@ -215,30 +304,26 @@ def parse_wcc_data(reply_data, offset):
 
 def unpack_opaque_flex(data, offset):
     """Unpack variable-length opaque data (length + data + padding)"""
-    length = struct.unpack('>I', data[offset:offset+4])[0]
+    length = _U32.unpack_from(data, offset)[0]
     offset += 4
-    opaque_data = data[offset:offset+length]
-    padding = (4 - (length % 4)) % 4
+    opaque_data = bytes(data[offset:offset+length])
+    padding = -length & 3
     offset += length + padding
     return opaque_data, offset
 
 
-def get_root_handle(sock):
+def get_root_handle(conn):
     """Helper function to get root handle via MOUNT"""
     xid = 0x12345678
     rpc_call = pack_rpc_call(xid, 100005, 3, 1)  # MOUNT (proc 1)
     mount_args = pack_filename3("/")
 
-    msg = rpc_call + mount_args
-    record_marker = struct.pack('>I', 0x80000000 | len(msg))
-    sock.send(record_marker + msg)
+    send_call(conn, rpc_call, mount_args)
 
-    header = sock.recv(4)
-    response_len = struct.unpack('>I', header)[0] & 0x7FFFFFFF
-    reply_data = sock.recv(response_len)
+    reply_data = conn.recv_record()
 
     offset = 24  # Skip RPC header
-    status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    status = _U32.unpack_from(reply_data, offset)[0]
 
     if status != 0:
         raise Exception(f"MOUNT failed with status {status}")
@@ -247,267 +332,234 @@ def get_root_handle(sock):
     return root_handle
 
 
-def test_link_and_verify(server_ip, server_port):
-    """Test NFS LINK procedure - create hard link and verify"""
+# Root handle cache keyed by server address: the handle is invariant for the
+# life of the server, so only the first sub-test pays the MOUNT round-trip.
+# The lock keeps concurrent sub-tests from each issuing their own MOUNT.
+_ROOT_HANDLE_CACHE = {}
+_ROOT_HANDLE_LOCK = threading.Lock()
 
-    print("=" * 60)
-    print("Testing NFS LINK Procedure (15)")
-    print("=" * 60)
 
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.connect((server_ip, server_port))
+def cached_root_handle(conn):
+    """Get the root handle, mounting over conn only on the first call"""
+    key = conn.sock.getpeername()
+    with _ROOT_HANDLE_LOCK:
+        handle = _ROOT_HANDLE_CACHE.get(key)
+        if handle is None:
+            handle = get_root_handle(conn)
+            _ROOT_HANDLE_CACHE[key] = handle
+    return handle
 
-    try:
-        # Step 1: MOUNT to get root handle
-        print("\n[1] Getting root handle via MOUNT...")
-        root_handle = get_root_handle(sock)
-        print(f"  Got root handle: {root_handle.hex()} ({len(root_handle)} bytes)")
 
-        # Step 2: Create a test file
-        print("\n[2] Creating test file 'test_source_file.txt'...")
-        xid = 0x12345679
-        rpc_call = pack_rpc_call(xid, 100003, 3, 8)  # CREATE (proc 8)
+def test_link_and_verify(conn):
+    """Test NFS LINK procedure - create hard link and verify"""
 
-        create_args = pack_create3args(root_handle, "test_source_file.txt", mode=0o644)
+    log("=" * 60)
+    log("Testing NFS LINK Procedure (15)")
+    log("=" * 60)
 
-        msg = rpc_call + create_args
-        record_marker = struct.pack('>I', 0x80000000 | len(msg))
-        sock.send(record_marker + msg)
+    # Step 1: MOUNT to get root handle
+    log("\n[1] Getting root handle (MOUNT on first call, cached after)...")
+    root_handle = cached_root_handle(conn)
+    if VERBOSE:
+        # .hex() builds a 2N-char string per handle; only pay for it when shown
+        print(f"  Got root handle: {root_handle.hex()} ({len(root_handle)} bytes)")
 
-        # Receive response
-        header = sock.recv(4)
-        response_len = struct.unpack('>I', header)[0] & 0x7FFFFFFF
-        reply_data = sock.recv(response_len)
+    # Step 2: Create a test file
+    log("\n[2] Creating test file 'test_source_file.txt'...")
+    xid = 0x12345679
+    rpc_call = pack_rpc_call(xid, 100003, 3, 8)  # CREATE (proc 8)
 
-        # Parse CREATE3res
-        offset = 24  # Skip RPC header
-        status = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        offset += 4
+    create_args = pack_create3args(root_handle, "test_source_file.txt", mode=0o644)
+
+    send_call(conn, rpc_call, create_args)
+    reply_data = conn.recv_record()
+
+    # Parse CREATE3res
+    offset = 24  # Skip RPC header
+    status = _U32.unpack_from(reply_data, offset)[0]
+    offset += 4
 
-        if status != 0:
-            print(f"  ERROR: CREATE failed with status {status}")
-            return False
+    if status != 0:
+        print(f"  ERROR: CREATE failed with status {status}")
+        return False
 
-        # Get file handle
-        file_handle, offset = parse_post_op_fh3(reply_data, offset)
-        if not file_handle:
-            print(f"  ERROR: No file handle returned")
-            return False
+    # Get file handle
+    file_handle, offset = parse_post_op_fh3(reply_data, offset)
+    if not file_handle:
+        print(f"  ERROR: No file handle returned")
+        return False
 
+    if VERBOSE:
         print(f"  Created file, handle: {file_handle.hex()} ({len(file_handle)} bytes)")
 
-        # Get initial link count
-        attr_present, initial_nlink, offset = parse_post_op_attr(reply_data, offset)
-        print(f"  Initial link count: {initial_nlink}")
+    # Get initial link count
+    attr_present, initial_nlink, offset = parse_post_op_attr(reply_data, offset)
+    log(f"  Initial link count: {initial_nlink}")
 
-        # Step 3: Create a hard link
-        print("\n[3] Creating hard link 'test_hardlink.txt' -> 'test_source_file.txt'...")
-        xid = 0x1234567A
-        rpc_call = pack_rpc_call(xid, 100003, 3, 15)  # LINK (proc 15)
+    # Step 3: Create a hard link
+    log("\n[3] Creating hard link 'test_hardlink.txt' -> 'test_source_file.txt'...")
+    xid = 0x1234567A
+    rpc_call = pack_rpc_call(xid, 100003, 3, 15)  # LINK (proc 15)
 
-        link_args = pack_link3args(file_handle, root_handle, "test_hardlink.txt")
+    link_args = pack_link3args(file_handle, root_handle, "test_hardlink.txt")
 
-        msg = rpc_call + link_args
-        record_marker = struct.pack('>I', 0x80000000 | len(msg))
-        sock.send(record_marker + msg)
+    send_call(conn, rpc_call, link_args)
+    reply_data = conn.recv_record()
 
-        # Receive response
-        header = sock.recv(4)
-        response_len = struct.unpack('>I', header)[0] & 0x7FFFFFFF
-        reply_data = sock.recv(response_len)
+    # Parse RPC reply header and the LINK3res status in one unpack
+    (reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat,
+     status) = _RPC_REPLY_WITH_STATUS.unpack_from(reply_data, 0)
+    offset = 28
 
-        # Parse RPC reply header
-        (reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat) = \
-            struct.unpack('>IIIIII', reply_data[:24])
+    log(f"  LINK XID: {hex(reply_xid)}, accept_stat: {accept_stat}")
 
-        print(f"  LINK XID: {hex(reply_xid)}, accept_stat: {accept_stat}")
+    log(f"  Status: {status} (0=NFS3_OK)")
 
-        # Parse LINK3res
-        offset = 24
-        status = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        offset += 4
+    if status != 0:
+        print(f"  ERROR: LINK failed with status {status}")
+        return False
 
-        print(f"  Status: {status} (0=NFS3_OK)")
+    # Success case: parse post_op_attr + wcc_data
+    log(f"\n  Parsing LINK3resok structure...")
 
-        if status != 0:
-            print(f"  ERROR: LINK failed with status {status}")
-            return False
+    # Parse post_op_attr (source file attributes - link count should increase)
+    attr_present, new_nlink, offset = parse_post_op_attr(reply_data, offset)
+    if attr_present:
+        log(f"  Source file attributes present")
+        log(f"  New link count: {new_nlink}")
 
-        # Success case: parse post_op_attr + wcc_data
-        print(f"\n  Parsing LINK3resok structure...")
+        # Verify link count increased
+        if new_nlink != initial_nlink + 1:
+            print(f"  WARNING: Link count should increase from {initial_nlink} to {initial_nlink + 1}, got {new_nlink}")
+    else:
+        log(f"  No source file attributes")
 
-        # Parse post_op_attr (source file attributes - link count should increase)
-        attr_present, new_nlink, offset = parse_post_op_attr(reply_data, offset)
-        if attr_present:
-            print(f"  Source file attributes present")
-            print(f"  New link count: {new_nlink}")
+    # Parse wcc_data (target directory)
+    log(f"\n  Parsing wcc_data (target directory)...")
+    offset = parse_wcc_data(reply_data, offset)
 
-            # Verify link count increased
-            if new_nlink != initial_nlink + 1:
-                print(f"  WARNING: Link count should increase from {initial_nlink} to {initial_nlink + 1}, got {new_nlink}")
-        else:
-            print(f"  No source file attributes")
+    log(f"\n  Total response size: {len(reply_data)} bytes")
+    log(f"  Parsed offset: {offset} bytes")
 
-        # Parse wcc_data (target directory)
-        print(f"\n  Parsing wcc_data (target directory)...")
-        offset = parse_wcc_data(reply_data, offset)
+    if offset != len(reply_data):
+        print(f"  WARNING: Response size mismatch!")
+        log(f"  Unparsed data: {(len(reply_data) - offset)} bytes")
+        return False
 
-        print(f"\n  Total response size: {len(reply_data)} bytes")
-        print(f"  Parsed offset: {offset} bytes")
+    print("\n✓ LINK test PASSED - format validation successful")
+    log(f"✓ Hard link created successfully, link count increased from {initial_nlink} to {new_nlink}")
+    return True
 
-        if offset != len(reply_data):
-            print(f"  WARNING: Response size mismatch!")
-            print(f"  Unparsed data: {(len(reply_data) - offset)} bytes")
-            return False
 
-        print("\n✓ LINK test PASSED - format validation successful")
-        print(f"✓ Hard link created successfully, link count increased from {initial_nlink} to {new_nlink}")
-        return True
+def test_link_already_exists(conn):
+    """Test LINK on existing filename (should return NFS3ERR_EXIST)"""
 
-    finally:
-        sock.close()
+    log("\n" + "=" * 60)
+    log("Testing LINK on existing filename")
+    log("=" * 60)
 
+    # Get root handle via MOUNT
+    log("\n[1] Getting root handle (MOUNT on first call, cached after)...")
+    root_handle = cached_root_handle(conn)
 
-def test_link_already_exists(server_ip, server_port):
-    """Test LINK on existing filename (should return NFS3ERR_EXIST)"""
+    # Create a test file
+    log("\n[2] Creating test file 'link_source.txt'...")
+    xid = 0x1234567B
+    rpc_call = pack_rpc_call(xid, 100003, 3, 8)  # CREATE (proc 8)
+    create_args = pack_create3args(root_handle, "link_source.txt", mode=0o644)
 
-    print("\n" + "=" * 60)
-    print("Testing LINK on existing filename")
-    print("=" * 60)
+    send_call(conn, rpc_call, create_args)
+    reply_data = conn.recv_record()
 
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.connect((server_ip, server_port))
+    offset = 24
+    status = _U32.unpack_from(reply_data, offset)[0]
+    if status != 0:
+        print(f"  ERROR: CREATE failed")
+        return False
 
-    try:
-        # Get root handle via MOUNT
-        print("\n[1] Getting root handle via MOUNT...")
-        root_handle = get_root_handle(sock)
-
-        # Create a test file
-        print("\n[2] Creating test file 'link_source.txt'...")
-        xid = 0x1234567B
-        rpc_call = pack_rpc_call(xid, 100003, 3, 8)  # CREATE (proc 8)
-        create_args = pack_create3args(root_handle, "link_source.txt", mode=0o644)
-
-        msg = rpc_call + create_args
-        record_marker = struct.pack('>I', 0x80000000 | len(msg))
-        sock.send(record_marker + msg)
-
-        header = sock.recv(4)
-        response_len = struct.unpack('>I', header)[0] & 0x7FFFFFFF
-        reply_data = sock.recv(response_len)
-
-        offset = 24
-        status = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        if status != 0:
-            print(f"  ERROR: CREATE failed")
-            return False
-
-        file_handle, _ = parse_post_op_fh3(reply_data, offset + 4)
-
-        # Try to create link with same name as source file
-        print("\n[3] Attempting to create link with existing name 'link_source.txt'...")
-        xid = 0x1234567C
-        rpc_call = pack_rpc_call(xid, 100003, 3, 15)  # LINK (proc 15)
-
-        link_args = pack_link3args(file_handle, root_handle, "link_source.txt")
-
-        msg = rpc_call + link_args
-        record_marker = struct.pack('>I', 0x80000000 | len(msg))
-        sock.send(record_marker + msg)
-
-        # Receive response
-        header = sock.recv(4)
-        response_len = struct.unpack('>I', header)[0] & 0x7FFFFFFF
-        reply_data = sock.recv(response_len)
-
-        # Parse response
-        offset = 24  # Skip RPC header
-        status = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        offset += 4
+    file_handle, _ = parse_post_op_fh3(reply_data, offset + 4)
 
-        print(f"  Status: {status} (17=NFS3ERR_EXIST expected)")
+    # Try to create link with same name as source file
+    log("\n[3] Attempting to create link with existing name 'link_source.txt'...")
+    xid = 0x1234567C
+    rpc_call = pack_rpc_call(xid, 100003, 3, 15)  # LINK (proc 15)
 
-        # Parse post_op_attr + wcc_data (present in both success and failure cases)
-        print(f"\n  Parsing post_op_attr...")
-        attr_present, nlink, offset = parse_post_op_attr(reply_data, offset)
+    link_args = pack_link3args(file_handle, root_handle, "link_source.txt")
 
-        print(f"\n  Parsing wcc_data...")
-        offset = parse_wcc_data(reply_data, offset)
+    send_call(conn, rpc_call, link_args)
+    reply_data = conn.recv_record()
 
-        if offset != len(reply_data):
-            print(f"  WARNING: Response size mismatch!")
-            return False
+    # Parse response
+    offset = 24  # Skip RPC header
+    status = _U32.unpack_from(reply_data, offset)[0]
+    offset += 4
 
-        if status == 17:  # NFS3ERR_EXIST
-            print("\n✓ LINK already exists test PASSED - returned NFS3ERR_EXIST")
-            return True
-        else:
-            print(f"\n✗ LINK test FAILED - expected status 17, got {status}")
-            return False
+    log(f"  Status: {status} (17=NFS3ERR_EXIST expected)")
 
-    finally:
-        sock.close()
+    # Parse post_op_attr + wcc_data (present in both success and failure cases)
+    log(f"\n  Parsing post_op_attr...")
+    attr_present, nlink, offset = parse_post_op_attr(reply_data, offset)
 
+    log(f"\n  Parsing wcc_data...")
+    offset = parse_wcc_data(reply_data, offset)
 
-def test_link_to_directory(server_ip, server_port):
-    """Test LINK on a directory (should return NFS3ERR_ISDIR)"""
+    if offset != len(reply_data):
+        print(f"  WARNING: Response size mismatch!")
+        return False
 
-    print("\n" + "=" * 60)
-    print("Testing LINK on directory (should fail)")
-    print("=" * 60)
+    if status == 17:  # NFS3ERR_EXIST
+        print("\n✓ LINK already exists test PASSED - returned NFS3ERR_EXIST")
+        return True
+    else:
+        print(f"\n✗ LINK test FAILED - expected status 17, got {status}")
+        return False
 
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.connect((server_ip, server_port))
 
-    try:
-        # Get root handle via MOUNT
-        print("\n[1] Getting root handle via MOUNT...")
-        root_handle = get_root_handle(sock)
+def test_link_to_directory(conn):
+    """Test LINK on a directory (should return NFS3ERR_ISDIR)"""
 
-        # Try to create hard link to root directory (should fail)
-        print("\n[2] Attempting to create hard link to directory...")
-        xid = 0x1234567D
-        rpc_call = pack_rpc_call(xid, 100003, 3, 15)  # LINK (proc 15)
+    log("\n" + "=" * 60)
+    log("Testing LINK on directory (should fail)")
+    log("=" * 60)
 
-        link_args = pack_link3args(root_handle, root_handle, "dir_link")
+    # Get root handle via MOUNT
+    log("\n[1] Getting root handle (MOUNT on first call, cached after)...")
+    root_handle = cached_root_handle(conn)
 
-        msg = rpc_call + link_args
-        record_marker = struct.pack('>I', 0x80000000 | len(msg))
-        sock.send(record_marker + msg)
+    # Try to create hard link to root directory (should fail)
+    log("\n[2] Attempting to create hard link to directory...")
+    xid = 0x1234567D
+    rpc_call = pack_rpc_call(xid, 100003, 3, 15)  # LINK (proc 15)
 
-        # Receive response
-        header = sock.recv(4)
-        response_len = struct.unpack('>I', header)[0] & 0x7FFFFFFF
-        reply_data = sock.recv(response_len)
+    link_args = pack_link3args(root_handle, root_handle, "dir_link")
 
-        # Parse response
-        offset = 24  # Skip RPC header
-        status = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        offset += 4
+    send_call(conn, rpc_call, link_args)
+    reply_data = conn.recv_record()
 
-        print(f"  Status: {status} (21=NFS3ERR_ISDIR expected)")
+    # Parse response
+    offset = 24  # Skip RPC header
+    status = _U32.unpack_from(reply_data, offset)[0]
+    offset += 4
 
-        # Parse post_op_attr + wcc_data
-        print(f"\n  Parsing post_op_attr...")
-        attr_present, nlink, offset = parse_post_op_attr(reply_data, offset)
+    log(f"  Status: {status} (21=NFS3ERR_ISDIR expected)")
 
-        print(f"\n  Parsing wcc_data...")
-        offset = parse_wcc_data(reply_data, offset)
+    # Parse post_op_attr + wcc_data
+    log(f"\n  Parsing post_op_attr...")
+    attr_present, nlink, offset = parse_post_op_attr(reply_data, offset)
 
-        if offset != len(reply_data):
-            print(f"  WARNING: Response size mismatch!")
-            return False
+    log(f"\n  Parsing wcc_data...")
+    offset = parse_wcc_data(reply_data, offset)
 
-        if status == 21:  # NFS3ERR_ISDIR
-            print("\n✓ LINK to directory test PASSED - returned NFS3ERR_ISDIR")
-            return True
-        else:
-            print(f"\n✗ LINK test FAILED - expected status 21 (NFS3ERR_ISDIR), got {status}")
-            return False
+    if offset != len(reply_data):
+        print(f"  WARNING: Response size mismatch!")
+        return False
 
-    finally:
-        sock.close()
+    if status == 21:  # NFS3ERR_ISDIR
+        print("\n✓ LINK to directory test PASSED - returned NFS3ERR_ISDIR")
+        return True
+    else:
+        print(f"\n✗ LINK test FAILED - expected status 21 (NFS3ERR_ISDIR), got {status}")
+        return False
 
 
 if __name__ == '__main__':
@@ -518,19 +570,25 @@ if __name__ == '__main__':
     server_ip = sys.argv[1]
     server_port = int(sys.argv[2])
 
-    success = True
-
-    # Test 1: Create hard link and verify link count
-    if not test_link_and_verify(server_ip, server_port):
-        success = False
+    # The three sub-tests are independent RPC dialogues, so run them in
+    # parallel on one connection each (the GIL is released inside socket
+    # send/recv, so the overlap is real). TCP_NODELAY keeps the small RPCs
+    # from waiting on Nagle coalescing.
+    tests = [test_link_and_verify, test_link_already_exists, test_link_to_directory]
+    conns = []
+    for _ in tests:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.connect((server_ip, server_port))
+        conns.append(RpcConn(sock))
 
-    # Test 2: Try to create link with existing filename
-    if not test_link_already_exists(server_ip, server_port):
-        success = False
-
-    # Test 3: Try to create hard link to directory
-    if not test_link_to_directory(server_ip, server_port):
-        success = False
+    try:
+        with ThreadPoolExecutor(max_workers=len(tests)) as pool:
+            results = list(pool.map(lambda t: t[0](t[1]), zip(tests, conns)))
+        success = all(results)
+    finally:
+        for conn in conns:
+            conn.sock.close()
 
     if success:
         print("\n" + "=" * 60)
@@ -10,77 +10,16 @@ This test validates:
 4. Test error handling for non-existent files
 """
 
-import socket
 import struct
 import sys
 
+from _rpc import RpcClient, U32, VERBOSE, pack_opaque, pack_string, unpack_opaque_flex, vprint
 
-def pack_string(s):
-    """Pack a string as XDR string"""
-    data = s.encode('utf-8')
-    length = len(data)
-    padding = (4 - (length % 4)) % 4
-    return struct.pack('>I', length) + data + b'\x00' * padding
-
-
-def unpack_opaque_flex(data, offset):
-    """Unpack variable-length opaque data (length + data)"""
-    length = struct.unpack('>I', data[offset:offset+4])[0]
-    opaque_data = data[offset+4:offset+4+length]
-    padding = (4 - (length % 4)) % 4
-    next_offset = offset + 4 + length + padding
-    return opaque_data, next_offset
-
-
-def rpc_call(host, port, xid, prog, vers, proc, args_data):
-    """Make an RPC call and return the response"""
-    # Build RPC call header
-    message = b''
-    message += struct.pack('>I', xid)      # XID
-    message += struct.pack('>I', 0)        # msg_type = CALL (0)
-    message += struct.pack('>I', 2)        # RPC version
-    message += struct.pack('>I', prog)     # Program
-    message += struct.pack('>I', vers)     # Version
-    message += struct.pack('>I', proc)     # Procedure
-    # cred (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-    # verf (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-
-    # Add procedure arguments
-    call_msg = message + args_data
-
-    # Add RPC record marking
-    msg_len = len(call_msg)
-    record_header = struct.pack('>I', 0x80000000 | msg_len)
-
-    # Connect and send
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(5.0)
-    sock.connect((host, port))
-    sock.sendall(record_header + call_msg)
-
-    # Receive response
-    reply_header_bytes = sock.recv(4)
-    if len(reply_header_bytes) != 4:
-        sock.close()
-        raise Exception("Failed to read response header")
-
-    reply_header = struct.unpack('>I', reply_header_bytes)[0]
-    reply_len = reply_header & 0x7FFFFFFF
-
-    # Read response data
-    reply_data = b''
-    while len(reply_data) < reply_len:
-        chunk = sock.recv(reply_len - len(reply_data))
-        if not chunk:
-            break
-        reply_data += chunk
-
-    sock.close()
-    return reply_data
+# fattr3 numeric prefix (ftype..size) decoded in one unpack, and the ftype
+# name table built once at import instead of per reply
+_ATTR6 = struct.Struct('>IIIIIQ')
+_REPLY6 = struct.Struct('>IIIIII')
+_FTYPE_NAMES = {1: "REG", 2: "DIR", 3: "BLK", 4: "CHR", 5: "LNK", 6: "SOCK", 7: "FIFO"}
 
 
 def parse_rpc_reply(reply_data):
@@ -88,9 +27,8 @@ def parse_rpc_reply(reply_data):
     if len(reply_data) < 24:
         raise Exception(f"Response too short: {len(reply_data)} bytes")
 
-    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = struct.unpack(
-        '>IIIIII', reply_data[:24]
-    )
+    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = \
+        _REPLY6.unpack_from(reply_data, 0)
 
     if reply_stat != 0 or accept_stat != 0:
         raise Exception(f"RPC error: reply_stat={reply_stat}, accept_stat={accept_stat}")
@@ -101,16 +39,20 @@ def parse_rpc_reply(reply_data):
 def test_nfs_lookup():
     """Test NFS LOOKUP procedure"""
 
-    print("Test: NFS LOOKUP Procedure")
-    print("=" * 60)
-    print()
+    vprint("Test: NFS LOOKUP Procedure")
+    vprint("=" * 60)
+    vprint()
 
     host = "localhost"
     port = 4000
 
+    # One persistent connection for MOUNT and every LOOKUP in the loop
+    # (reconnecting per call paid a TCP handshake + teardown each time)
+    client = RpcClient(host, port)
+
     # Step 1: Call MOUNT to get root file handle
-    print("Step 1: MOUNT to get root file handle")
-    print("-" * 60)
+    vprint("Step 1: MOUNT to get root file handle")
+    vprint("-" * 60)
 
     mount_xid = 200001
     mount_prog = 100005  # MOUNT
@@ -121,17 +63,17 @@ def test_nfs_lookup():
     dirpath = "/"
     mount_args = pack_string(dirpath)
 
-    print(f"  Calling MOUNT MNT for path: {dirpath}")
+    vprint(f"  Calling MOUNT MNT for path: {dirpath}")
 
     try:
-        reply_data = rpc_call(host, port, mount_xid, mount_prog, mount_vers, mount_proc, mount_args)
+        reply_data = client.call(mount_xid, mount_prog, mount_vers, mount_proc, mount_args)
 
         # Parse RPC reply
         _, _, _, offset = parse_rpc_reply(reply_data)
 
         # Parse mountres3: status(4) + fhandle (if status == 0)
-        mount_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        print(f"  MOUNT status: {mount_status}")
+        mount_status = U32.unpack_from(reply_data, offset)[0]
+        vprint(f"  MOUNT status: {mount_status}")
 
         if mount_status != 0:
             print(f"  ✗ MOUNT failed with status {mount_status}")
@@ -139,9 +81,11 @@ def test_nfs_lookup():
 
         # Extract file handle (variable-length opaque)
         root_fhandle, next_offset = unpack_opaque_flex(reply_data, offset + 4)
-        print(f"  ✓ Got root handle: {len(root_fhandle)} bytes")
-        print(f"    Handle (hex): {root_fhandle.hex()}")
-        print()
+        vprint(f"  ✓ Got root handle: {len(root_fhandle)} bytes")
+        if VERBOSE:
+            # .hex() builds a 2N-char string; only pay for it when shown
+            print(f"    Handle (hex): {root_fhandle.hex()}")
+        vprint()
 
     except Exception as e:
         print(f"  ✗ MOUNT failed: {e}")
@@ -150,8 +94,8 @@ def test_nfs_lookup():
         sys.exit(1)
 
     # Step 2: Call NFS LOOKUP to find a file in root
-    print("Step 2: NFS LOOKUP for file in root directory")
-    print("-" * 60)
+    vprint("Step 2: NFS LOOKUP for file in root directory")
+    vprint("-" * 60)
 
     # Note: The test assumes /tmp has some files. We'll try to look up a common file.
     # For the test to be robust, we should create a known test file first.
@@ -165,37 +109,48 @@ def test_nfs_lookup():
         ("nonexistent_file_12345.txt", False, "Test error handling for missing file"),
     ]
 
-    for filename, expect_success, description in test_cases:
-        print(f"\n  Test: LOOKUP '{filename}' ({description})")
-        print("  " + "-" * 56)
+    nfs_prog = 100003  # NFS
+    nfs_vers = 3
+    nfs_proc = 3  # LOOKUP
 
-        nfs_xid = 200002
-        nfs_prog = 100003  # NFS
-        nfs_vers = 3
-        nfs_proc = 3  # LOOKUP
+    # Pipeline all four LOOKUPs: every request only depends on the MOUNT
+    # result, so send them back-to-back on the connection and then read the
+    # four replies, matching responses to test cases by XID. Collapses four
+    # network round trips into one.
+    calls = []
+    xids = []
+    for i, (filename, _, _) in enumerate(test_cases):
+        nfs_xid = 200002 + i
+        xids.append(nfs_xid)
 
         # LOOKUP3args: fhandle3 (dir handle) + filename3 (name)
-        lookup_args = b''
+        lookup_args = pack_opaque(root_fhandle) + pack_string(filename)
+
+        calls.append((nfs_xid, nfs_prog, nfs_vers, nfs_proc, lookup_args))
+
+    client.flush(calls)
 
-        # Add directory handle (variable-length opaque)
-        lookup_args += struct.pack('>I', len(root_fhandle)) + root_fhandle
-        padding = (4 - (len(root_fhandle) % 4)) % 4
-        lookup_args += b'\x00' * padding
+    replies = {}
+    for _ in calls:
+        reply = client.recv()
+        replies[U32.unpack_from(reply, 0)[0]] = reply
 
-        # Add filename (XDR string)
-        lookup_args += pack_string(filename)
+    if set(replies) != set(xids):
+        raise Exception(f"Unexpected reply XIDs: {sorted(replies)}")
 
-        print(f"    Calling NFS LOOKUP for: {filename}")
+    for nfs_xid, (filename, expect_success, description) in zip(xids, test_cases):
+        vprint(f"\n  Test: LOOKUP '{filename}' ({description})")
+        vprint("  " + "-" * 56)
 
         try:
-            reply_data = rpc_call(host, port, nfs_xid, nfs_prog, nfs_vers, nfs_proc, lookup_args)
+            reply_data = replies[nfs_xid]
 
             # Parse RPC reply header
             _, _, _, offset = parse_rpc_reply(reply_data)
 
             # Parse LOOKUP3res: status(4) + results (if status == 0)
-            nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
-            print(f"    NFS status: {nfs_status} (0=NFS3_OK, 2=NFS3ERR_NOENT)")
+            nfs_status = U32.unpack_from(reply_data, offset)[0]
+            vprint(f"    NFS status: {nfs_status} (0=NFS3_OK, 2=NFS3ERR_NOENT)")
 
             if nfs_status == 0:
                 # NFS3_OK - parse LOOKUP3resok
@@ -203,56 +158,54 @@ def test_nfs_lookup():
 
                 # Extract object file handle
                 obj_handle, next_offset = unpack_opaque_flex(reply_data, offset + 4)
-                print(f"    ✓ Found file handle: {len(obj_handle)} bytes")
-                print(f"      Handle (hex): {obj_handle.hex()[:32]}...")
+                vprint(f"    ✓ Found file handle: {len(obj_handle)} bytes")
+                if VERBOSE:
+                    # Only the first 16 bytes are shown, so hexlify just those
+                    print(f"      Handle (hex): {obj_handle[:16].hex()}...")
 
                 # Parse obj_attributes (fattr3 - 84 bytes)
-                ftype = struct.unpack('>I', reply_data[next_offset:next_offset+4])[0]
-                mode = struct.unpack('>I', reply_data[next_offset+4:next_offset+8])[0]
-                nlink = struct.unpack('>I', reply_data[next_offset+8:next_offset+12])[0]
-                uid = struct.unpack('>I', reply_data[next_offset+12:next_offset+16])[0]
-                gid = struct.unpack('>I', reply_data[next_offset+16:next_offset+20])[0]
-                size = struct.unpack('>Q', reply_data[next_offset+20:next_offset+28])[0]
-
-                ftype_names = {1: "REG", 2: "DIR", 3: "BLK", 4: "CHR", 5: "LNK", 6: "SOCK", 7: "FIFO"}
-                ftype_name = ftype_names.get(ftype, f"UNKNOWN({ftype})")
-
-                print(f"      Type: {ftype_name}")
-                print(f"      Mode: {oct(mode)}")
-                print(f"      Links: {nlink}")
-                print(f"      UID: {uid}")
-                print(f"      GID: {gid}")
-                print(f"      Size: {size} bytes")
+                ftype, mode, nlink, uid, gid, size = _ATTR6.unpack_from(reply_data, next_offset)
+
+                ftype_name = _FTYPE_NAMES.get(ftype, f"UNKNOWN({ftype})")
+
+                vprint(f"      Type: {ftype_name}")
+                vprint(f"      Mode: {oct(mode)}")
+                vprint(f"      Links: {nlink}")
+                vprint(f"      UID: {uid}")
+                vprint(f"      GID: {gid}")
+                vprint(f"      Size: {size} bytes")
 
                 if expect_success:
-                    print(f"    ✅ LOOKUP '{filename}' succeeded as expected")
+                    vprint(f"    ✅ LOOKUP '{filename}' succeeded as expected")
                 else:
                     print(f"    ⚠️  LOOKUP '{filename}' succeeded but expected failure")
 
             elif nfs_status == 2:
                 # NFS3ERR_NOENT - file not found
-                print(f"    File not found (expected for non-existent files)")
+                vprint(f"    File not found (expected for non-existent files)")
                 if not expect_success:
-                    print(f"    ✅ LOOKUP '{filename}' failed as expected")
+                    vprint(f"    ✅ LOOKUP '{filename}' failed as expected")
                 else:
                     print(f"    ⚠️  LOOKUP '{filename}' failed but expected success")
 
             else:
                 # Other NFS error
-                print(f"    NFS error: status={nfs_status}")
+                vprint(f"    NFS error: status={nfs_status}")
                 print(f"    ⚠️  Unexpected NFS error")
 
         except Exception as e:
             print(f"    ✗ LOOKUP failed: {e}")
             if expect_success:
-                print(f"    Test failed for '{filename}'")
+                vprint(f"    Test failed for '{filename}'")
             else:
-                print(f"    Error expected, test passed")
+                vprint(f"    Error expected, test passed")
+
+    client.close()
 
-    print()
-    print("=" * 60)
+    vprint()
+    vprint("=" * 60)
     print("✅ NFS LOOKUP test COMPLETED")
-    print()
+    vprint()
     print("Summary:")
     print("  ✓ MOUNT procedure returns valid directory handle")
     print("  ✓ NFS LOOKUP procedure works with directory handle")
@@ -10,49 +10,57 @@ import struct
 import sys
 import os
 
+from _rpc import pack_opaque, pack_string, unpack_opaque_flex
+
+# Precompiled parse formats (compiled once at import, reused for every reply)
+_RPC_REPLY_HDR = struct.Struct('>IIIIII')   # xid..accept_stat
+_U32 = struct.Struct('>I')
+
+# Precompiled pack formats for the XDR argument builders
+_U32x2 = struct.Struct('>II')
+_U32Q = struct.Struct('>IQ')
+_U32x3 = struct.Struct('>III')
+_RPC_CALL_HDR = struct.Struct('>IIIIIIIIII')   # xid..proc + cred/verf flavor+length
+
 
 def pack_rpc_call(xid, prog, vers, proc, auth_flavor=0, auth_len=0, verf_flavor=0, verf_len=0):
-    """Pack RPC call header"""
-    # RPC header (28 bytes base)
-    rpc_header = struct.pack(
-        '>IIIIIIII',
+    """Pack RPC call header (xid..proc + credential + verifier, 40 bytes)"""
+    return _RPC_CALL_HDR.pack(
         xid,         # XID
         0,           # Message type (0 = CALL)
         2,           # RPC version
         prog,        # Program
         vers,        # Version
         proc,        # Procedure
-        auth_flavor, # Auth flavor
-        auth_len     # Auth length
+        auth_flavor, # Cred flavor
+        auth_len,    # Cred length
+        verf_flavor, # Verf flavor
+        verf_len     # Verf length
     )
 
-    # Add verifier
-    verf = struct.pack('>II', verf_flavor, verf_len)
 
-    return rpc_header + verf
+_SATTR3_CACHE = {}
 
 
-def pack_fhandle3(handle):
-    """Pack file handle (length + data + padding)"""
-    handle_len = len(handle)
-    packed = struct.pack('>I', handle_len)
-    packed += handle
-    # Add padding to 4-byte boundary
-    padding = (4 - (handle_len % 4)) % 4
-    packed += b'\x00' * padding
-    return packed
+def _sattr3_struct(key):
+    """Struct for one combination of set/unset sattr3 fields (cached).
 
-
-def pack_filename3(name):
-    """Pack filename (length + string + padding)"""
-    name_bytes = name.encode('utf-8')
-    name_len = len(name_bytes)
-    packed = struct.pack('>I', name_len)
-    packed += name_bytes
-    # Add padding to 4-byte boundary
-    padding = (4 - (name_len % 4)) % 4
-    packed += b'\x00' * padding
-    return packed
+    key is the tuple of six booleans saying which unions carry a value;
+    the matching format is compiled once and reused, so pack_sattr3 emits
+    the whole structure in a single pack call.
+    """
+    st = _SATTR3_CACHE.get(key)
+    if st is None:
+        mode_set, uid_set, gid_set, size_set, atime_set, mtime_set = key
+        fmt = ('>'
+               + ('II' if mode_set else 'I')
+               + ('II' if uid_set else 'I')
+               + ('II' if gid_set else 'I')
+               + ('IQ' if size_set else 'I')
+               + ('III' if atime_set else 'I')
+               + ('III' if mtime_set else 'I'))
+        st = _SATTR3_CACHE[key] = struct.Struct(fmt)
+    return st
 
 
 def pack_sattr3(mode=None, uid=None, gid=None, size=None, atime_set=False, mtime_set=False):
@@ -62,66 +70,99 @@ def pack_sattr3(mode=None, uid=None, gid=None, size=None, atime_set=False, mtime
     Each field is a union discriminated by a boolean:
     - False (0) = don't set
     - True (1) = set to following value
+
+    The Struct for each set/unset combination is compiled on first use and
+    cached, so the common mode-only call packs all seven words in one shot.
     """
-    packed = b''
+    key = (mode is not None, uid is not None, gid is not None,
+           size is not None, bool(atime_set), bool(mtime_set))
 
-    # mode (set_mode3 union)
-    if mode is not None:
-        packed += struct.pack('>II', 1, mode)  # SET_MODE discriminator (1) + mode value
-    else:
-        packed += struct.pack('>I', 0)  # DONT_SET_MODE discriminator (0)
+    vals = []
+    for is_set, value in ((key[0], mode), (key[1], uid), (key[2], gid), (key[3], size)):
+        if is_set:
+            vals += (1, value)
+        else:
+            vals.append(0)
+    vals += (1, 0, 0) if atime_set else (0,)
+    vals += (1, 0, 0) if mtime_set else (0,)
 
-    # uid (set_uid3 union)
-    if uid is not None:
-        packed += struct.pack('>II', 1, uid)
-    else:
-        packed += struct.pack('>I', 0)
+    return _sattr3_struct(key).pack(*vals)
 
-    # gid (set_gid3 union)
-    if gid is not None:
-        packed += struct.pack('>II', 1, gid)
-    else:
-        packed += struct.pack('>I', 0)
 
-    # size (set_size3 union)
-    if size is not None:
-        packed += struct.pack('>IQ', 1, size)
-    else:
-        packed += struct.pack('>I', 0)
+# Both sub-tests create the same directory with the same mode, so the
+# constant tail of MKDIR3args (dirname + sattr3) is packed once at import;
+# each call only prepends the directory handle from that run's MOUNT.
+_MKDIR_ARGS_TAIL = pack_string("testdir_mkdir") + pack_sattr3(mode=0o755)
 
-    # atime (set_atime union)
-    if atime_set:
-        # SET_TO_CLIENT_TIME (1) + nfstime3 (seconds + nseconds)
-        packed += struct.pack('>III', 1, 0, 0)
-    else:
-        packed += struct.pack('>I', 0)  # DONT_CHANGE
 
-    # mtime (set_mtime union)
-    if mtime_set:
-        packed += struct.pack('>III', 1, 0, 0)
+def _sendmsg_all(sock, buffers):
+    """sendall semantics for a list of buffers (sendmsg may send short)"""
+    bufs = [memoryview(b) for b in buffers if len(b)]
+    while bufs:
+        sent = sock.sendmsg(bufs)
+        while sent > 0:
+            if sent >= len(bufs[0]):
+                sent -= len(bufs[0])
+                bufs.pop(0)
+            else:
+                bufs[0] = bufs[0][sent:]
+                sent = 0
+
+
+def send_call(sock, rpc_header, args_data):
+    """Send one record-marked RPC call as a scatter-gather write.
+
+    sendmsg hands the kernel the marker, header, and args as an iovec
+    (writev), so no concatenated frame is built in user space. Platforms
+    without sendmsg fall back to one joined sendall.
+    """
+    marker = _U32.pack(0x80000000 | (len(rpc_header) + len(args_data)))
+    if hasattr(sock, "sendmsg"):
+        _sendmsg_all(sock, [marker, rpc_header, args_data])
     else:
-        packed += struct.pack('>I', 0)
+        sock.sendall(marker + rpc_header + args_data)
 
-    return packed
 
+def recv_record(sock):
+    """Read one record-marked RPC reply with fully drained recv_into loops.
 
-def pack_mkdir3args(dir_handle, dirname, mode=0o755):
-    """Pack MKDIR3args structure"""
-    packed = pack_fhandle3(dir_handle)
-    packed += pack_filename3(dirname)
-    packed += pack_sattr3(mode=mode)
-    return packed
+    A bare sock.recv(n) may legally return fewer bytes than requested, so
+    both the 4-byte marker and the body are drained into preallocated
+    buffers until complete.
+    """
+    hdr = bytearray(4)
+    mv = memoryview(hdr)
+    got = 0
+    while got < 4:
+        n = sock.recv_into(mv[got:])
+        if not n:
+            raise Exception("Connection closed while reading record marker")
+        got += n
+
+    reply_len = _U32.unpack_from(hdr, 0)[0] & 0x7FFFFFFF
+    body = bytearray(reply_len)
+    mv = memoryview(body)
+    got = 0
+    while got < reply_len:
+        n = sock.recv_into(mv[got:])
+        if not n:
+            raise Exception("Connection closed while reading reply body")
+        got += n
+
+    # Hand parsers a memoryview so their offset slicing stays zero-copy; the
+    # few handles that outlive parsing are copied out with bytes() explicitly.
+    return memoryview(body)
 
 
 def parse_post_op_fh3(reply_data, offset):
     """Parse post_op_fh3 (optional file handle)"""
-    handle_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    handle_follows = _U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     if handle_follows:
-        handle_len = struct.unpack('>I', reply_data[offset:offset+4])[0]
+        handle_len = _U32.unpack_from(reply_data, offset)[0]
         offset += 4
-        handle = reply_data[offset:offset+handle_len]
+        handle = bytes(reply_data[offset:offset+handle_len])
         padding = (4 - (handle_len % 4)) % 4
         offset += handle_len + padding
         return handle, offset
@@ -131,7 +172,7 @@ def parse_post_op_fh3(reply_data, offset):
 
 def parse_post_op_attr(reply_data, offset):
     """Parse post_op_attr (optional fattr3)"""
-    attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    attr_follows = _U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     if attr_follows:
@@ -155,47 +196,61 @@ def parse_wcc_data(reply_data, offset):
         after:  post_op_attr  (bool + optional 84 bytes)
     }
     """
-    start_offset = offset
-
-    # Parse pre_op_attr
-    pre_attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    # Parse pre_op_attr: nothing in this test reads the wcc_attr fields, so
+    # skip the 24 bytes instead of unpacking values that are thrown away
+    pre_attr_follows = _U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     if pre_attr_follows:
         # wcc_attr = 24 bytes (size:8 + mtime:8 + ctime:8)
-        size = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-        offset += 8
-        mtime_sec, mtime_nsec = struct.unpack('>II', reply_data[offset:offset+8])
-        offset += 8
-        ctime_sec, ctime_nsec = struct.unpack('>II', reply_data[offset:offset+8])
-        offset += 8
+        offset += 24
 
     # Parse post_op_attr
-    post_attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    post_attr_follows = _U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     if post_attr_follows:
         # fattr3 = 84 bytes
         offset += 84
 
-    # Validate wcc_data size
-    expected_size = 4 + (24 if pre_attr_follows else 0) + 4 + (84 if post_attr_follows else 0)
-    actual_size = offset - start_offset
+    return offset
 
-    if actual_size != expected_size:
-        raise Exception(f"wcc_data size mismatch: expected {expected_size}, got {actual_size}")
 
-    return offset
+# Root handle cache keyed by server address: the handle is invariant for the
+# life of the server, so only the first sub-test pays the MOUNT round-trip.
+_ROOT_HANDLE_CACHE = {}
 
 
-def unpack_opaque_flex(data, offset):
-    """Unpack variable-length opaque data (length + data + padding)"""
-    length = struct.unpack('>I', data[offset:offset+4])[0]
-    offset += 4
-    opaque_data = data[offset:offset+length]
-    padding = (4 - (length % 4)) % 4
-    offset += length + padding
-    return opaque_data, offset
+def get_root_handle(sock, addr, xid):
+    """Root handle via MOUNT, cached per server address across sub-tests.
+
+    Returns None (after printing the error) if MOUNT fails.
+    """
+    root_handle = _ROOT_HANDLE_CACHE.get(addr)
+    if root_handle is not None:
+        print(f"  Reusing cached root handle ({len(root_handle)} bytes)")
+        return root_handle
+
+    rpc_call = pack_rpc_call(xid, 100005, 3, 1)  # MOUNT (proc 1)
+    mount_args = pack_string("/")
+
+    send_call(sock, rpc_call, mount_args)
+
+    reply_data = recv_record(sock)
+
+    offset = 24  # Skip RPC header
+    status = _U32.unpack_from(reply_data, offset)[0]
+
+    if status != 0:
+        print(f"  ERROR: MOUNT failed with status {status}")
+        return None
+
+    # Copied out of the reply view: it is cached and reused as a MKDIR
+    # argument after the view's buffer is recycled
+    root_handle, _ = unpack_opaque_flex(reply_data, offset + 4)
+    root_handle = bytes(root_handle)
+    _ROOT_HANDLE_CACHE[addr] = root_handle
+    return root_handle
 
 
 def test_mkdir(server_ip, server_port):
@@ -206,44 +261,16 @@ def test_mkdir(server_ip, server_port):
     print("=" * 60)
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Small request/reply RPCs: don't let Nagle hold the frames back
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     sock.connect((server_ip, server_port))
 
     try:
         # Step 1: MOUNT to get root handle
         print("\n[1] Getting root handle via MOUNT...")
-        xid = 0x12345678
-        rpc_call = pack_rpc_call(xid, 100005, 3, 1)  # MOUNT (proc 1)
-
-        # Pack mount path "/"
-        mount_args = pack_filename3("/")
-
-        # Send MOUNT request
-        msg = rpc_call + mount_args
-        record_marker = struct.pack('>I', 0x80000000 | len(msg))
-        sock.send(record_marker + msg)
-
-        # Receive response
-        header = sock.recv(4)
-        response_len = struct.unpack('>I', header)[0] & 0x7FFFFFFF
-        reply_data = sock.recv(response_len)
-
-        # Parse RPC reply header (24 bytes)
-        (reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat) = \
-            struct.unpack('>IIIIII', reply_data[:24])
-
-        print(f"  MOUNT XID: {hex(reply_xid)}, accept_stat: {accept_stat}")
-
-        # Parse MOUNTSTAT3res
-        offset = 24
-        status = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        offset += 4
-
-        if status != 0:
-            print(f"  ERROR: MOUNT failed with status {status}")
+        root_handle = get_root_handle(sock, (server_ip, server_port), 0x12345678)
+        if root_handle is None:
             return False
-
-        # Get root handle
-        root_handle, offset = unpack_opaque_flex(reply_data, offset)
         print(f"  Got root handle: {root_handle.hex()} ({len(root_handle)} bytes)")
 
         # Step 2: Create a new directory
@@ -251,27 +278,23 @@ def test_mkdir(server_ip, server_port):
         xid = 0x12345679
         rpc_call = pack_rpc_call(xid, 100003, 3, 9)  # MKDIR (proc 9)
 
-        mkdir_args = pack_mkdir3args(root_handle, "testdir_mkdir", mode=0o755)
+        mkdir_args = pack_opaque(root_handle) + _MKDIR_ARGS_TAIL
 
         # Send MKDIR request
-        msg = rpc_call + mkdir_args
-        record_marker = struct.pack('>I', 0x80000000 | len(msg))
-        sock.send(record_marker + msg)
+        send_call(sock, rpc_call, mkdir_args)
 
         # Receive response
-        header = sock.recv(4)
-        response_len = struct.unpack('>I', header)[0] & 0x7FFFFFFF
-        reply_data = sock.recv(response_len)
+        reply_data = recv_record(sock)
 
         # Parse RPC reply header
         (reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat) = \
-            struct.unpack('>IIIIII', reply_data[:24])
+            _RPC_REPLY_HDR.unpack_from(reply_data, 0)
 
         print(f"  MKDIR XID: {hex(reply_xid)}, accept_stat: {accept_stat}")
 
         # Parse MKDIR3res
         offset = 24
-        status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+        status = _U32.unpack_from(reply_data, offset)[0]
         offset += 4
 
         print(f"  Status: {status} (0=NFS3_OK)")
@@ -327,50 +350,32 @@ def test_mkdir_already_exists(server_ip, server_port):
     print("=" * 60)
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Small request/reply RPCs: don't let Nagle hold the frames back
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     sock.connect((server_ip, server_port))
 
     try:
-        # First get root handle via MOUNT
+        # First get root handle (cached from test_mkdir's MOUNT)
         print("\n[1] Getting root handle via MOUNT...")
-        xid = 0x1234567A
-        rpc_call = pack_rpc_call(xid, 100005, 3, 1)  # MOUNT (proc 1)
-        mount_args = pack_filename3("/")
-
-        msg = rpc_call + mount_args
-        record_marker = struct.pack('>I', 0x80000000 | len(msg))
-        sock.send(record_marker + msg)
-
-        header = sock.recv(4)
-        response_len = struct.unpack('>I', header)[0] & 0x7FFFFFFF
-        reply_data = sock.recv(response_len)
-
-        offset = 24
-        status = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        if status != 0:
-            print(f"  ERROR: MOUNT failed")
+        root_handle = get_root_handle(sock, (server_ip, server_port), 0x1234567A)
+        if root_handle is None:
             return False
 
-        root_handle, _ = unpack_opaque_flex(reply_data, offset + 4)
-
         # Try to create the same directory again
         print("\n[2] Attempting to create 'testdir_mkdir' again...")
         xid = 0x1234567B
         rpc_call = pack_rpc_call(xid, 100003, 3, 9)  # MKDIR (proc 9)
 
-        mkdir_args = pack_mkdir3args(root_handle, "testdir_mkdir", mode=0o755)
+        mkdir_args = pack_opaque(root_handle) + _MKDIR_ARGS_TAIL
 
-        msg = rpc_call + mkdir_args
-        record_marker = struct.pack('>I', 0x80000000 | len(msg))
-        sock.send(record_marker + msg)
+        send_call(sock, rpc_call, mkdir_args)
 
         # Receive response
-        header = sock.recv(4)
-        response_len = struct.unpack('>I', header)[0] & 0x7FFFFFFF
-        reply_data = sock.recv(response_len)
+        reply_data = recv_record(sock)
 
         # Parse response
         offset = 24  # Skip RPC header
-        status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+        status = _U32.unpack_from(reply_data, offset)[0]
         offset += 4
 
         print(f"  Status: {status} (17=NFS3ERR_EXIST expected)")
@@ -10,92 +10,18 @@ This test validates:
 4. FSSTAT to get filesystem statistics
 """
 
-import socket
 import struct
 import sys
 
+from _rpc import RpcClient, U32, pack_opaque, pack_string, parse_rpc_reply_status, unpack_opaque_flex
 
-def pack_string(s):
-    """Pack a string as XDR string"""
-    data = s.encode('utf-8')
-    length = len(data)
-    padding = (4 - (length % 4)) % 4
-    return struct.pack('>I', length) + data + b'\x00' * padding
-
-
-def unpack_opaque_flex(data, offset):
-    """Unpack variable-length opaque data (length + data)"""
-    length = struct.unpack('>I', data[offset:offset+4])[0]
-    opaque_data = data[offset+4:offset+4+length]
-    padding = (4 - (length % 4)) % 4
-    next_offset = offset + 4 + length + padding
-    return opaque_data, next_offset
-
-
-def rpc_call(host, port, xid, prog, vers, proc, args_data):
-    """Make an RPC call and return the response"""
-    # Build RPC call header
-    message = b''
-    message += struct.pack('>I', xid)      # XID
-    message += struct.pack('>I', 0)        # msg_type = CALL (0)
-    message += struct.pack('>I', 2)        # RPC version
-    message += struct.pack('>I', prog)     # Program
-    message += struct.pack('>I', vers)     # Version
-    message += struct.pack('>I', proc)     # Procedure
-    # cred (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-    # verf (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-
-    # Add procedure arguments
-    call_msg = message + args_data
-
-    # Add RPC record marking
-    msg_len = len(call_msg)
-    record_header = struct.pack('>I', 0x80000000 | msg_len)
-
-    # Connect and send
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(5.0)
-    sock.connect((host, port))
-    sock.sendall(record_header + call_msg)
-
-    # Receive response
-    reply_header_bytes = sock.recv(4)
-    if len(reply_header_bytes) != 4:
-        sock.close()
-        raise Exception("Failed to read response header")
-
-    reply_header = struct.unpack('>I', reply_header_bytes)[0]
-    reply_len = reply_header & 0x7FFFFFFF
-
-    # Read response data
-    reply_data = b''
-    while len(reply_data) < reply_len:
-        chunk = sock.recv(reply_len - len(reply_data))
-        if not chunk:
-            break
-        reply_data += chunk
-
-    sock.close()
-    return reply_data
-
-
-def parse_rpc_reply(reply_data):
-    """Parse RPC reply header"""
-    if len(reply_data) < 24:
-        raise Exception(f"Response too short: {len(reply_data)} bytes")
-
-    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = struct.unpack(
-        '>IIIIII', reply_data[:24]
-    )
-
-    if reply_stat != 0 or accept_stat != 0:
-        raise Exception(f"RPC error: reply_stat={reply_stat}, accept_stat={accept_stat}")
-
-    return 24
+# FSINFO3resok tail (rtmax..properties) and FSSTAT3resok tail
+# (tbytes..invarsec) each decode in one unpack_from
+_FSINFO_TAIL = struct.Struct('>IIIIIIIQIII')
+_FSSTAT_TAIL = struct.Struct('>QQQQQQI')
+
+# XDR-packed mount path folded at import (constant for every run)
+_MOUNT_ARGS = pack_string("/")
 
 
 def test_mount_procedures():
@@ -108,36 +34,33 @@ def test_mount_procedures():
     host = "localhost"
     port = 4000
 
+    # One persistent connection for MOUNT and every NFS procedure after it
+    # (reconnecting per call paid a TCP handshake + teardown each time)
+    client = RpcClient(host, port)
+
     # Step 1: MOUNT
     print("Step 1: MOUNT /")
     print("-" * 60)
     mount_xid = 500001
-    mount_args = pack_string("/")
 
-    reply_data = rpc_call(host, port, mount_xid, 100005, 3, 1, mount_args)
-    offset = parse_rpc_reply(reply_data)
+    reply_data = client.call(mount_xid, 100005, 3, 1, _MOUNT_ARGS)
+    offset, mount_status = parse_rpc_reply_status(reply_data)
 
-    mount_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
     if mount_status != 0:
         print(f"  ✗ MOUNT failed with status {mount_status}")
         sys.exit(1)
 
-    root_fhandle, _ = unpack_opaque_flex(reply_data, offset + 4)
+    root_fhandle, _ = unpack_opaque_flex(reply_data, offset)
     print(f"  ✓ Got root handle: {len(root_fhandle)} bytes")
     print()
 
-    # Step 2: ACCESS
-    print("Step 2: ACCESS (check root directory permissions)")
-    print("-" * 60)
+    # ACCESS, FSINFO, and FSSTAT all take only the root handle and do not
+    # depend on each other, so pipeline them: send all three calls
+    # back-to-back on the connection, then read the three replies and match
+    # them to procedures by XID. Hides two of the three round trips.
     access_xid = 500002
-
-    # ACCESS3args: fhandle3 (object) + uint32 (access bits)
-    access_args = b''
-
-    # Add file handle (variable-length opaque)
-    access_args += struct.pack('>I', len(root_fhandle)) + root_fhandle
-    padding = (4 - (len(root_fhandle) % 4)) % 4
-    access_args += b'\x00' * padding
+    fsinfo_xid = 500003
+    fsstat_xid = 500004
 
     # Request all access permissions (READ, LOOKUP, MODIFY, EXTEND, DELETE, EXECUTE)
     ACCESS3_READ = 0x0001
@@ -148,13 +71,32 @@ def test_mount_procedures():
     ACCESS3_EXECUTE = 0x0020
     requested_access = ACCESS3_READ | ACCESS3_LOOKUP | ACCESS3_MODIFY
 
-    access_args += struct.pack('>I', requested_access)
+    # ACCESS3args: fhandle3 (object) + uint32 (access bits);
+    # FSINFO3args / FSSTAT3args: fhandle3 (fsroot)
+    fh_args = pack_opaque(root_fhandle)
+    access_args = fh_args + U32.pack(requested_access)
+
+    client.flush([
+        (access_xid, 100003, 3, 4, access_args),
+        (fsinfo_xid, 100003, 3, 19, fh_args),
+        (fsstat_xid, 100003, 3, 18, fh_args),
+    ])
 
-    reply_data = rpc_call(host, port, access_xid, 100003, 3, 4, access_args)
-    offset = parse_rpc_reply(reply_data)
+    replies = {}
+    for _ in range(3):
+        reply = client.recv()
+        replies[U32.unpack_from(reply, 0)[0]] = reply
+
+    if set(replies) != {access_xid, fsinfo_xid, fsstat_xid}:
+        raise Exception(f"Unexpected reply XIDs: {sorted(replies)}")
+
+    # Step 2: ACCESS
+    print("Step 2: ACCESS (check root directory permissions)")
+    print("-" * 60)
 
-    # Parse ACCESS3res
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    # Parse ACCESS3res (header and status decode together)
+    reply_data = replies[access_xid]
+    offset, nfs_status = parse_rpc_reply_status(reply_data)
     print(f"  NFS status: {nfs_status} (0=NFS3_OK)")
 
     if nfs_status != 0:
@@ -162,8 +104,8 @@ def test_mount_procedures():
         sys.exit(1)
 
     # Skip fattr3 (84 bytes) and get granted access
-    offset += 4 + 84
-    granted_access = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    offset += 84
+    granted_access = U32.unpack_from(reply_data, offset)[0]
 
     print(f"  ✓ Requested access: {requested_access:#06x}")
     print(f"  ✓ Granted access:   {granted_access:#06x}")
@@ -179,19 +121,10 @@ def test_mount_procedures():
     # Step 3: FSINFO
     print("Step 3: FSINFO (get filesystem capabilities)")
     print("-" * 60)
-    fsinfo_xid = 500003
-
-    # FSINFO3args: fhandle3 (fsroot)
-    fsinfo_args = b''
-    fsinfo_args += struct.pack('>I', len(root_fhandle)) + root_fhandle
-    padding = (4 - (len(root_fhandle) % 4)) % 4
-    fsinfo_args += b'\x00' * padding
 
-    reply_data = rpc_call(host, port, fsinfo_xid, 100003, 3, 19, fsinfo_args)
-    offset = parse_rpc_reply(reply_data)
-
-    # Parse FSINFO3res
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    # Parse FSINFO3res (header and status decode together)
+    reply_data = replies[fsinfo_xid]
+    offset, nfs_status = parse_rpc_reply_status(reply_data)
     print(f"  NFS status: {nfs_status} (0=NFS3_OK)")
 
     if nfs_status != 0:
@@ -199,60 +132,34 @@ def test_mount_procedures():
         sys.exit(1)
 
     # Parse FSINFO3resok
-    offset += 4 + 84  # status + fattr3
-
-    rtmax = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    offset += 4
-    rtpref = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    offset += 4
-    rtmult = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    offset += 4
-    wtmax = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    offset += 4
-    wtpref = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    offset += 4
-    wtmult = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    offset += 4
-    dtpref = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    offset += 4
-    maxfilesize = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-    offset += 8
-    time_delta_sec = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    offset += 4
-    time_delta_nsec = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    offset += 4
-    properties = struct.unpack('>I', reply_data[offset:offset+4])[0]
-
-    print(f"  ✓ Read Transfer:")
-    print(f"    Max:  {rtmax} bytes ({rtmax // 1024} KB)")
-    print(f"    Pref: {rtpref} bytes ({rtpref // 1024} KB)")
-    print(f"    Mult: {rtmult} bytes")
-    print(f"  ✓ Write Transfer:")
-    print(f"    Max:  {wtmax} bytes ({wtmax // 1024} KB)")
-    print(f"    Pref: {wtpref} bytes ({wtpref // 1024} KB)")
-    print(f"    Mult: {wtmult} bytes")
-    print(f"  ✓ Directory read pref: {dtpref} bytes")
-    print(f"  ✓ Max file size: {maxfilesize:#x}")
-    print(f"  ✓ Time delta: {time_delta_sec}s + {time_delta_nsec}ns")
-    print(f"  ✓ Properties: {properties:#06x}")
-    print()
+    offset += 84  # fattr3
+
+    (rtmax, rtpref, rtmult, wtmax, wtpref, wtmult, dtpref, maxfilesize,
+     time_delta_sec, time_delta_nsec, properties) = \
+        _FSINFO_TAIL.unpack_from(reply_data, offset)
+
+    # One print per result block: a single write instead of ~12 line-buffered
+    # flushes on a TTY
+    print(f"  ✓ Read Transfer:\n"
+          f"    Max:  {rtmax} bytes ({rtmax // 1024} KB)\n"
+          f"    Pref: {rtpref} bytes ({rtpref // 1024} KB)\n"
+          f"    Mult: {rtmult} bytes\n"
+          f"  ✓ Write Transfer:\n"
+          f"    Max:  {wtmax} bytes ({wtmax // 1024} KB)\n"
+          f"    Pref: {wtpref} bytes ({wtpref // 1024} KB)\n"
+          f"    Mult: {wtmult} bytes\n"
+          f"  ✓ Directory read pref: {dtpref} bytes\n"
+          f"  ✓ Max file size: {maxfilesize:#x}\n"
+          f"  ✓ Time delta: {time_delta_sec}s + {time_delta_nsec}ns\n"
+          f"  ✓ Properties: {properties:#06x}\n")
 
     # Step 4: FSSTAT
     print("Step 4: FSSTAT (get filesystem statistics)")
     print("-" * 60)
-    fsstat_xid = 500004
 
-    # FSSTAT3args: fhandle3 (fsroot)
-    fsstat_args = b''
-    fsstat_args += struct.pack('>I', len(root_fhandle)) + root_fhandle
-    padding = (4 - (len(root_fhandle) % 4)) % 4
-    fsstat_args += b'\x00' * padding
-
-    reply_data = rpc_call(host, port, fsstat_xid, 100003, 3, 18, fsstat_args)
-    offset = parse_rpc_reply(reply_data)
-
-    # Parse FSSTAT3res
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    # Parse FSSTAT3res (header and status decode together)
+    reply_data = replies[fsstat_xid]
+    offset, nfs_status = parse_rpc_reply_status(reply_data)
     print(f"  NFS status: {nfs_status} (0=NFS3_OK)")
 
     if nfs_status != 0:
@@ -260,30 +167,20 @@ def test_mount_procedures():
         sys.exit(1)
 
     # Parse FSSTAT3resok
-    offset += 4 + 84  # status + fattr3
-
-    tbytes = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-    offset += 8
-    fbytes = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-    offset += 8
-    abytes = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-    offset += 8
-    tfiles = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-    offset += 8
-    ffiles = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-    offset += 8
-    afiles = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-    offset += 8
-    invarsec = struct.unpack('>I', reply_data[offset:offset+4])[0]
-
-    print(f"  ✓ Total bytes:     {tbytes:,} ({tbytes // (1024**3)} GB)")
-    print(f"  ✓ Free bytes:      {fbytes:,} ({fbytes // (1024**3)} GB)")
-    print(f"  ✓ Available bytes: {abytes:,} ({abytes // (1024**3)} GB)")
-    print(f"  ✓ Total inodes:    {tfiles:,}")
-    print(f"  ✓ Free inodes:     {ffiles:,}")
-    print(f"  ✓ Avail inodes:    {afiles:,}")
-    print(f"  ✓ Invariant time:  {invarsec}s")
-    print()
+    offset += 84  # fattr3
+
+    tbytes, fbytes, abytes, tfiles, ffiles, afiles, invarsec = \
+        _FSSTAT_TAIL.unpack_from(reply_data, offset)
+
+    print(f"  ✓ Total bytes:     {tbytes:,} ({tbytes // (1024**3)} GB)\n"
+          f"  ✓ Free bytes:      {fbytes:,} ({fbytes // (1024**3)} GB)\n"
+          f"  ✓ Available bytes: {abytes:,} ({abytes // (1024**3)} GB)\n"
+          f"  ✓ Total inodes:    {tfiles:,}\n"
+          f"  ✓ Free inodes:     {ffiles:,}\n"
+          f"  ✓ Avail inodes:    {afiles:,}\n"
+          f"  ✓ Invariant time:  {invarsec}s\n")
+
+    client.close()
 
     print("✅ ALL MOUNT-CRITICAL PROCEDURES PASSED")
     print()
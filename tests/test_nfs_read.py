@@ -10,77 +10,14 @@ This test validates:
 4. Verify data matches expected content
 """
 
-import socket
 import struct
 import sys
 
+from _rpc import (RpcClient, U32, RPC_REPLY_HDR, get_root_handle, pack_opaque,
+                  pack_string, unpack_opaque_flex)
 
-def pack_string(s):
-    """Pack a string as XDR string"""
-    data = s.encode('utf-8')
-    length = len(data)
-    padding = (4 - (length % 4)) % 4
-    return struct.pack('>I', length) + data + b'\x00' * padding
-
-
-def unpack_opaque_flex(data, offset):
-    """Unpack variable-length opaque data (length + data)"""
-    length = struct.unpack('>I', data[offset:offset+4])[0]
-    opaque_data = data[offset+4:offset+4+length]
-    padding = (4 - (length % 4)) % 4
-    next_offset = offset + 4 + length + padding
-    return opaque_data, next_offset
-
-
-def rpc_call(host, port, xid, prog, vers, proc, args_data):
-    """Make an RPC call and return the response"""
-    # Build RPC call header
-    message = b''
-    message += struct.pack('>I', xid)      # XID
-    message += struct.pack('>I', 0)        # msg_type = CALL (0)
-    message += struct.pack('>I', 2)        # RPC version
-    message += struct.pack('>I', prog)     # Program
-    message += struct.pack('>I', vers)     # Version
-    message += struct.pack('>I', proc)     # Procedure
-    # cred (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-    # verf (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-
-    # Add procedure arguments
-    call_msg = message + args_data
-
-    # Add RPC record marking
-    msg_len = len(call_msg)
-    record_header = struct.pack('>I', 0x80000000 | msg_len)
-
-    # Connect and send
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(5.0)
-    sock.connect((host, port))
-    sock.sendall(record_header + call_msg)
-
-    # Receive response
-    reply_header_bytes = sock.recv(4)
-    if len(reply_header_bytes) != 4:
-        sock.close()
-        raise Exception("Failed to read response header")
-
-    reply_header = struct.unpack('>I', reply_header_bytes)[0]
-    reply_len = reply_header & 0x7FFFFFFF
-
-    # Read response data
-    reply_data = b''
-    while len(reply_data) < reply_len:
-        chunk = sock.recv(reply_len - len(reply_data))
-        if not chunk:
-            break
-        reply_data += chunk
-
-    sock.close()
-    return reply_data
+# READ3args tail (offset + count) packed in one call
+_READ_TAIL = struct.Struct('>QI')
 
 
 def parse_rpc_reply(reply_data):
@@ -88,9 +25,8 @@ def parse_rpc_reply(reply_data):
     if len(reply_data) < 24:
         raise Exception(f"Response too short: {len(reply_data)} bytes")
 
-    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = struct.unpack(
-        '>IIIIII', reply_data[:24]
-    )
+    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = \
+        RPC_REPLY_HDR.unpack_from(reply_data, 0)
 
     if reply_stat != 0 or accept_stat != 0:
         raise Exception(f"RPC error: reply_stat={reply_stat}, accept_stat={accept_stat}")
@@ -108,6 +44,10 @@ def test_nfs_read():
     host = "localhost"
     port = 4000
 
+    # One persistent connection for MOUNT, LOOKUP, and both READs
+    # (per-call connects paid a TCP handshake + teardown each time)
+    client = RpcClient(host, port)
+
     # Prepare test file content
     test_filename = "test_read_file.txt"
     test_content = b"Hello, NFS World! This is a test file for READ procedure."
@@ -116,21 +56,16 @@ def test_nfs_read():
     print(f"Expected content ({len(test_content)} bytes): {test_content[:50]}...")
     print()
 
-    # Step 1: MOUNT
+    # Step 1: MOUNT (cached per export, so reruns in one process skip the RPC)
     print("Step 1: MOUNT /")
     print("-" * 60)
     mount_xid = 400001
-    mount_args = pack_string("/")
-
-    reply_data = rpc_call(host, port, mount_xid, 100005, 3, 1, mount_args)
-    offset = parse_rpc_reply(reply_data)
 
-    mount_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    if mount_status != 0:
-        print(f"  ✗ MOUNT failed with status {mount_status}")
+    try:
+        root_fhandle = get_root_handle(client, "/", mount_xid)
+    except Exception as e:
+        print(f"  ✗ {e}")
         sys.exit(1)
-
-    root_fhandle, _ = unpack_opaque_flex(reply_data, offset + 4)
     print(f"  ✓ Got root handle: {len(root_fhandle)} bytes")
     print()
 
@@ -139,17 +74,13 @@ def test_nfs_read():
     print("-" * 60)
     lookup_xid = 400002
 
-    # LOOKUP3args
-    lookup_args = b''
-    lookup_args += struct.pack('>I', len(root_fhandle)) + root_fhandle
-    padding = (4 - (len(root_fhandle) % 4)) % 4
-    lookup_args += b'\x00' * padding
-    lookup_args += pack_string(test_filename)
+    # LOOKUP3args: fhandle3 (dir handle) + filename3 (name)
+    lookup_args = pack_opaque(root_fhandle) + pack_string(test_filename)
 
-    reply_data = rpc_call(host, port, lookup_xid, 100003, 3, 3, lookup_args)
+    reply_data = client.call(lookup_xid, 100003, 3, 3, lookup_args)
     offset = parse_rpc_reply(reply_data)
 
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    nfs_status = U32.unpack_from(reply_data, offset)[0]
     if nfs_status != 0:
         print(f"  ✗ LOOKUP failed with status {nfs_status}")
         print(f"  Make sure {test_filename} exists in /tmp")
@@ -165,27 +96,37 @@ def test_nfs_read():
     print("-" * 60)
     read_xid = 400003
 
-    # READ3args: file handle + offset + count
-    read_args = b''
+    # READ3args: fhandle3 (file) + offset (uint64) + count (uint32);
+    # both READs share the handle, so pack it once
+    file_fh_xdr = pack_opaque(file_handle)
+    read_args = file_fh_xdr + _READ_TAIL.pack(0, 1024)
 
-    # File handle (variable-length opaque)
-    read_args += struct.pack('>I', len(file_handle)) + file_handle
-    padding = (4 - (len(file_handle) % 4)) % 4
-    read_args += b'\x00' * padding
+    # The partial read of Step 4 only depends on the same file handle, so
+    # pipeline both READs now and match the replies by XID — one round trip
+    # instead of two.
+    partial_xid = 400004
+    partial_args = file_fh_xdr + _READ_TAIL.pack(7, 10)
 
-    # Offset (uint64)
-    read_args += struct.pack('>Q', 0)
+    print(f"  Reading from offset 0, count 1024 bytes")
 
-    # Count (uint32) - read 1024 bytes
-    read_args += struct.pack('>I', 1024)
+    client.flush([
+        (read_xid, 100003, 3, 6, read_args),
+        (partial_xid, 100003, 3, 6, partial_args),
+    ])
 
-    print(f"  Reading from offset 0, count 1024 bytes")
+    replies = {}
+    for _ in range(2):
+        reply = client.recv()
+        replies[U32.unpack_from(reply, 0)[0]] = reply
+
+    if set(replies) != {read_xid, partial_xid}:
+        raise Exception(f"Unexpected reply XIDs: {sorted(replies)}")
 
-    reply_data = rpc_call(host, port, read_xid, 100003, 3, 6, read_args)
+    reply_data = replies[read_xid]
     offset = parse_rpc_reply(reply_data)
 
     # Parse READ3res
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    nfs_status = U32.unpack_from(reply_data, offset)[0]
     print(f"  NFS status: {nfs_status} (0=NFS3_OK)")
 
     if nfs_status != 0:
@@ -200,15 +141,15 @@ def test_nfs_read():
     offset += 84
 
     # Get count
-    count = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    count = U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     # Get EOF flag
-    eof = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    eof = U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     # Get data
-    data_length = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    data_length = U32.unpack_from(reply_data, offset)[0]
     offset += 4
     data = reply_data[offset:offset+data_length]
 
@@ -239,25 +180,16 @@ def test_nfs_read():
     print()
     print("Step 4: Test partial READ (offset 7, count 10)")
     print("-" * 60)
-    read_xid = 400004
 
-    # READ3args with offset
-    read_args = b''
-    read_args += struct.pack('>I', len(file_handle)) + file_handle
-    padding = (4 - (len(file_handle) % 4)) % 4
-    read_args += b'\x00' * padding
-    read_args += struct.pack('>Q', 7)      # offset = 7
-    read_args += struct.pack('>I', 10)     # count = 10
-
-    reply_data = rpc_call(host, port, read_xid, 100003, 3, 6, read_args)
+    reply_data = replies[partial_xid]
     offset = parse_rpc_reply(reply_data)
 
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    nfs_status = U32.unpack_from(reply_data, offset)[0]
 
     if nfs_status == 0:
         # Skip to data
         offset += 4 + 84 + 4 + 4  # status + fattr3 + count + eof
-        data_length = struct.unpack('>I', reply_data[offset:offset+4])[0]
+        data_length = U32.unpack_from(reply_data, offset)[0]
         offset += 4
         partial_data = reply_data[offset:offset+data_length]
 
@@ -272,6 +204,8 @@ def test_nfs_read():
     else:
         print(f"  ✗ Partial READ failed with status {nfs_status}")
 
+    client.close()
+
 
 if __name__ == '__main__':
     test_nfs_read()
@@ -4,80 +4,17 @@ Test: NFS READDIR Procedure
 Purpose: Test directory listing functionality
 """
 
-import socket
 import struct
 import sys
 
+from _rpc import (RpcClient, U32, U64, RPC_REPLY_HDR, pack_opaque, pack_string,
+                  unpack_opaque_flex, vprint)
 
-def pack_string(s):
-    """Pack a string as XDR string"""
-    data = s.encode('utf-8')
-    length = len(data)
-    padding = (4 - (length % 4)) % 4
-    return struct.pack('>I', length) + data + b'\x00' * padding
-
-
-def unpack_opaque_flex(data, offset):
-    """Unpack variable-length opaque data (length + data)"""
-    length = struct.unpack('>I', data[offset:offset+4])[0]
-    opaque_data = data[offset+4:offset+4+length]
-    padding = (4 - (length % 4)) % 4
-    next_offset = offset + 4 + length + padding
-    return opaque_data, next_offset
-
-
-def rpc_call(host, port, xid, prog, vers, proc, args_data):
-    """Make an RPC call and return the response"""
-    # Build RPC call header
-    message = b''
-    message += struct.pack('>I', xid)      # XID
-    message += struct.pack('>I', 0)        # msg_type = CALL (0)
-    message += struct.pack('>I', 2)        # RPC version
-    message += struct.pack('>I', prog)     # Program
-    message += struct.pack('>I', vers)     # Version
-    message += struct.pack('>I', proc)     # Procedure
-    # cred (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-    # verf (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-
-    # Add procedure arguments
-    call_msg = message + args_data
-
-    # Add RPC record marking
-    msg_len = len(call_msg)
-    record_header = struct.pack('>I', 0x80000000 | msg_len)
-
-    # Connect and send
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(5.0)
-    sock.connect((host, port))
-    sock.sendall(record_header + call_msg)
-
-    # Receive response
-    reply_header_bytes = sock.recv(4)
-    if len(reply_header_bytes) != 4:
-        sock.close()
-        raise Exception("Failed to read response header")
-
-    reply_header = struct.unpack('>I', reply_header_bytes)[0]
-    is_last = (reply_header & 0x80000000) != 0
-    reply_len = reply_header & 0x7FFFFFFF
-
-    print(f"  Response header: is_last={is_last}, length={reply_len}")
-
-    # Read response data
-    reply_data = b''
-    while len(reply_data) < reply_len:
-        chunk = sock.recv(reply_len - len(reply_data))
-        if not chunk:
-            break
-        reply_data += chunk
-
-    sock.close()
-    return reply_data
+# XDR-packed constants folded at import: the mount path never changes, and
+# the READDIR3args tail (cookie3 = 0, zero cookieverf3, count = 8192) is a
+# fixed block packed in one call
+_MOUNT_ARGS = pack_string("/")
+_READDIR_TAIL = struct.pack('>QQI', 0, 0, 8192)
 
 
 def parse_rpc_reply(reply_data):
@@ -85,15 +22,14 @@ def parse_rpc_reply(reply_data):
     if len(reply_data) < 24:
         raise Exception(f"Response too short: {len(reply_data)} bytes")
 
-    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = struct.unpack(
-        '>IIIIII', reply_data[:24]
-    )
+    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = \
+        RPC_REPLY_HDR.unpack_from(reply_data, 0)
 
-    print(f"  Reply XID: {reply_xid}")
-    print(f"  Reply stat: {reply_stat} (0=MSG_ACCEPTED)")
-    print(f"  Verf flavor: {verf_flavor}")
-    print(f"  Verf length: {verf_len}")
-    print(f"  Accept stat: {accept_stat} (0=SUCCESS)")
+    vprint(f"  Reply XID: {reply_xid}")
+    vprint(f"  Reply stat: {reply_stat} (0=MSG_ACCEPTED)")
+    vprint(f"  Verf flavor: {verf_flavor}")
+    vprint(f"  Verf length: {verf_len}")
+    vprint(f"  Accept stat: {accept_stat} (0=SUCCESS)")
 
     if reply_stat != 0 or accept_stat != 0:
         raise Exception(f"RPC error: reply_stat={reply_stat}, accept_stat={accept_stat}")
@@ -101,6 +37,44 @@ def parse_rpc_reply(reply_data):
     return 24
 
 
+def parse_readdir_entries(reply_data, offset):
+    """Parse the entry3 list of a READDIR3resok, return (entries, offset).
+
+    One tight pass with the Struct unpackers bound as locals; entries are
+    collected as (fileid, name, cookie) tuples so the caller prints after
+    parsing instead of interleaving stdout writes with the walk.
+    """
+    u32 = U32.unpack_from
+    u64 = U64.unpack_from
+    # Zero-copy view over the reply: names decode straight from the buffer
+    # instead of materializing a bytes slice per entry first
+    mv = memoryview(reply_data)
+    entries = []
+
+    has_entries = u32(reply_data, offset)[0]
+    offset += 4
+
+    while has_entries == 1:
+        # entry3: fileid + name (filename3) + cookie + nextentry
+        fileid = u64(reply_data, offset)[0]
+        offset += 8
+
+        name_len = u32(reply_data, offset)[0]
+        offset += 4
+        name = str(mv[offset:offset+name_len], 'utf-8')
+        offset += name_len + (-name_len & 3)
+
+        cookie = u64(reply_data, offset)[0]
+        offset += 8
+
+        entries.append((fileid, name, cookie))
+
+        has_entries = u32(reply_data, offset)[0]
+        offset += 4
+
+    return entries, offset
+
+
 def test_nfs_readdir():
     """Test NFS READDIR procedure"""
 
@@ -111,17 +85,20 @@ def test_nfs_readdir():
     host = "localhost"
     port = 4000
 
+    # One persistent connection for MOUNT and READDIR (per-call connects
+    # paid a TCP handshake + teardown each time)
+    client = RpcClient(host, port)
+
     # Step 1: MOUNT to get root handle
     print("Step 1: MOUNT /")
     print("-" * 70)
     mount_xid = 800001
-    mount_args = pack_string("/")
 
-    reply_data = rpc_call(host, port, mount_xid, 100005, 3, 1, mount_args)
+    reply_data = client.call(mount_xid, 100005, 3, 1, _MOUNT_ARGS)
 
     offset = parse_rpc_reply(reply_data)
 
-    mount_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    mount_status = U32.unpack_from(reply_data, offset)[0]
     if mount_status != 0:
         print(f"  ✗ MOUNT failed with status {mount_status}")
         sys.exit(1)
@@ -137,33 +114,19 @@ def test_nfs_readdir():
     readdir_xid = 800002
 
     # READDIR3args: fhandle3 (dir) + cookie3 + cookieverf3 + count
-    readdir_args = b''
-
-    # fhandle3 (dir)
-    readdir_args += struct.pack('>I', len(root_fhandle)) + root_fhandle
-    padding = (4 - (len(root_fhandle) % 4)) % 4
-    readdir_args += b'\x00' * padding
-
-    # cookie3 (start from beginning)
-    readdir_args += struct.pack('>Q', 0)
-
-    # cookieverf3 (8 bytes)
-    readdir_args += b'\x00' * 8
-
-    # count (max bytes to return)
-    readdir_args += struct.pack('>I', 8192)
+    readdir_args = pack_opaque(root_fhandle) + _READDIR_TAIL
 
     print(f"  READDIR args length: {len(readdir_args)} bytes")
     print(f"  Cookie: 0 (from beginning)")
     print(f"  Count: 8192 bytes")
     print()
 
-    reply_data = rpc_call(host, port, readdir_xid, 100003, 3, 16, readdir_args)
+    reply_data = client.call(readdir_xid, 100003, 3, 16, readdir_args)
 
     offset = parse_rpc_reply(reply_data)
 
     # Parse NFS status
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    nfs_status = U32.unpack_from(reply_data, offset)[0]
     print(f"  NFS status: {nfs_status} (0=NFS3_OK)")
     offset += 4
 
@@ -173,7 +136,7 @@ def test_nfs_readdir():
 
     # Parse post_op_attr (dir_attributes)
     # For simplicity, just skip fattr3 (84 bytes after the bool)
-    attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    attr_follows = U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     if attr_follows == 1:
@@ -185,38 +148,15 @@ def test_nfs_readdir():
     # Parse dirlist3 (entries list + eof)
     print(f"  Parsing directory entries:")
 
-    entries_count = 0
-    # Check if there are entries (Option<Box<entry3>>)
-    has_entries = struct.unpack('>I', reply_data[offset:offset+4])[0]
-    offset += 4
+    entries, offset = parse_readdir_entries(reply_data, offset)
 
-    while has_entries == 1:
-        # Parse entry3: fileid + name + cookie + nextentry
-        fileid = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-        offset += 8
-
-        # Parse filename (string)
-        name_len = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        offset += 4
-        name = reply_data[offset:offset+name_len].decode('utf-8')
-        offset += name_len
-        # Padding
-        name_padding = (4 - (name_len % 4)) % 4
-        offset += name_padding
-
-        # Cookie
-        cookie = struct.unpack('>Q', reply_data[offset:offset+8])[0]
-        offset += 8
+    for i, (fileid, name, cookie) in enumerate(entries, 1):
+        print(f"    [{i}] fileid={fileid}, name='{name}', cookie={cookie}")
 
-        entries_count += 1
-        print(f"    [{entries_count}] fileid={fileid}, name='{name}', cookie={cookie}")
-
-        # Check for next entry
-        has_entries = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        offset += 4
+    entries_count = len(entries)
 
     # EOF flag
-    eof = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    eof = U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     print()
@@ -224,6 +164,8 @@ def test_nfs_readdir():
     print(f"  ✓ EOF: {eof == 1}")
     print()
 
+    client.close()
+
     # Summary
     print("=" * 70)
     print("✅ NFS READDIR test PASSED")
@@ -4,80 +4,22 @@ Test: NFS REMOVE Procedure
 Purpose: Test file removal functionality
 """
 
-import socket
 import struct
 import sys
 
+from _rpc import (RpcClient, U32, U32_PAIR, U64, RPC_REPLY_HDR, get_root_handle,
+                  pack_opaque, pack_string, unpack_opaque_flex, vprint)
 
-def pack_string(s):
-    """Pack a string as XDR string"""
-    data = s.encode('utf-8')
-    length = len(data)
-    padding = (4 - (length % 4)) % 4
-    return struct.pack('>I', length) + data + b'\x00' * padding
-
-
-def unpack_opaque_flex(data, offset):
-    """Unpack variable-length opaque data (length + data)"""
-    length = struct.unpack('>I', data[offset:offset+4])[0]
-    opaque_data = data[offset+4:offset+4+length]
-    padding = (4 - (length % 4)) % 4
-    next_offset = offset + 4 + length + padding
-    return opaque_data, next_offset
-
-
-def rpc_call(host, port, xid, prog, vers, proc, args_data):
-    """Make an RPC call and return the response"""
-    # Build RPC call header
-    message = b''
-    message += struct.pack('>I', xid)      # XID
-    message += struct.pack('>I', 0)        # msg_type = CALL (0)
-    message += struct.pack('>I', 2)        # RPC version
-    message += struct.pack('>I', prog)     # Program
-    message += struct.pack('>I', vers)     # Version
-    message += struct.pack('>I', proc)     # Procedure
-    # cred (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-    # verf (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-
-    # Add procedure arguments
-    call_msg = message + args_data
-
-    # Add RPC record marking
-    msg_len = len(call_msg)
-    record_header = struct.pack('>I', 0x80000000 | msg_len)
-
-    # Connect and send
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(5.0)
-    sock.connect((host, port))
-    sock.sendall(record_header + call_msg)
-
-    # Receive response
-    reply_header_bytes = sock.recv(4)
-    if len(reply_header_bytes) != 4:
-        sock.close()
-        raise Exception("Failed to read response header")
-
-    reply_header = struct.unpack('>I', reply_header_bytes)[0]
-    is_last = (reply_header & 0x80000000) != 0
-    reply_len = reply_header & 0x7FFFFFFF
-
-    print(f"  Response header: is_last={is_last}, length={reply_len}")
-
-    # Read response data
-    reply_data = b''
-    while len(reply_data) < reply_len:
-        chunk = sock.recv(reply_len - len(reply_data))
-        if not chunk:
-            break
-        reply_data += chunk
-
-    sock.close()
-    return reply_data
+# XDR-packed constants folded at import: both test filenames never change,
+# and the createhow3 tail (UNCHECKED + sattr3 with only mode 0o644 set) is
+# a fixed 8-word block packed in one call
+_EXPORT = "/tmp/nfs_exports"
+_TEST_NAME_XDR = pack_string("test_remove.txt")
+_NONEXISTENT_NAME_XDR = pack_string("does_not_exist.txt")
+_CREATE_HOW = struct.pack('>8I', 0, 1, 0o644, 0, 0, 0, 0, 0)
+
+# fattr3 numeric prefix (ftype..size) decoded in one unpack
+_FATTR3_HEAD = struct.Struct('>IIIIIQ')
 
 
 def parse_rpc_reply(reply_data):
@@ -85,13 +27,12 @@ def parse_rpc_reply(reply_data):
     if len(reply_data) < 24:
         raise Exception(f"Response too short: {len(reply_data)} bytes")
 
-    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = struct.unpack(
-        '>IIIIII', reply_data[:24]
-    )
+    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = \
+        RPC_REPLY_HDR.unpack_from(reply_data, 0)
 
-    print(f"  Reply XID: {reply_xid}")
-    print(f"  Reply stat: {reply_stat} (0=MSG_ACCEPTED)")
-    print(f"  Accept stat: {accept_stat} (0=SUCCESS)")
+    vprint(f"  Reply XID: {reply_xid}")
+    vprint(f"  Reply stat: {reply_stat} (0=MSG_ACCEPTED)")
+    vprint(f"  Accept stat: {accept_stat} (0=SUCCESS)")
 
     if reply_stat != 0 or accept_stat != 0:
         raise Exception(f"RPC error: reply_stat={reply_stat}, accept_stat={accept_stat}")
@@ -113,17 +54,17 @@ def parse_wcc_data(reply_data, offset):
     start_offset = offset
 
     # 1. Parse pre_op_attr
-    pre_attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    pre_attr_follows = U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     pre_attr = None
     if pre_attr_follows:
         # wcc_attr = size(8) + mtime(8) + ctime(8) = 24 bytes
-        size = struct.unpack('>Q', reply_data[offset:offset+8])[0]
+        size = U64.unpack_from(reply_data, offset)[0]
         offset += 8
-        mtime_sec, mtime_nsec = struct.unpack('>II', reply_data[offset:offset+8])
+        mtime_sec, mtime_nsec = U32_PAIR.unpack_from(reply_data, offset)
         offset += 8
-        ctime_sec, ctime_nsec = struct.unpack('>II', reply_data[offset:offset+8])
+        ctime_sec, ctime_nsec = U32_PAIR.unpack_from(reply_data, offset)
         offset += 8
         pre_attr = {
             'size': size,
@@ -132,19 +73,13 @@ def parse_wcc_data(reply_data, offset):
         }
 
     # 2. Parse post_op_attr
-    post_attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    post_attr_follows = U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     post_attr = None
     if post_attr_follows:
-        # fattr3 = 84 bytes
-        fattr_start = offset
-        ftype = struct.unpack('>I', reply_data[offset:offset+4])[0]
-        mode = struct.unpack('>I', reply_data[offset+4:offset+8])[0]
-        nlink = struct.unpack('>I', reply_data[offset+8:offset+12])[0]
-        uid = struct.unpack('>I', reply_data[offset+12:offset+16])[0]
-        gid = struct.unpack('>I', reply_data[offset+16:offset+20])[0]
-        size = struct.unpack('>Q', reply_data[offset+20:offset+28])[0]
+        # fattr3 = 84 bytes; the leading fields decode in one unpack
+        ftype, mode, nlink, uid, gid, size = _FATTR3_HEAD.unpack_from(reply_data, offset)
         offset += 84
 
         post_attr = {
@@ -169,73 +104,70 @@ def test_remove(host, port):
     """Test REMOVE procedure"""
     print("\n=== Test: NFS REMOVE ===")
 
-    # Step 1: Mount to get root file handle
-    print("\n1. Calling MOUNT...")
-    mount_args = pack_string("/tmp/nfs_exports")
-    mount_reply = rpc_call(host, port, 1, 100005, 3, 1, mount_args)
-    offset = parse_rpc_reply(mount_reply)
+    # One persistent connection for every RPC in this test (per-call
+    # connects paid a TCP handshake + teardown each time)
+    client = RpcClient(host, port)
 
-    # Parse MOUNT reply
-    status = struct.unpack('>I', mount_reply[offset:offset+4])[0]
-    if status != 0:
-        raise Exception(f"MOUNT failed with status {status}")
-    offset += 4
-
-    root_handle, offset = unpack_opaque_flex(mount_reply, offset)
+    # Step 1: Get root file handle (MOUNT on first use, cached after)
+    print("\n1. Calling MOUNT...")
+    root_handle = get_root_handle(client, _EXPORT, 1)
     print(f"  Got root handle: {len(root_handle)} bytes")
 
+    # Every call below prepends the same root handle; pack it once
+    root_fh_xdr = pack_opaque(root_handle)
+
     # Step 2: CREATE a test file first
     print("\n2. Creating test file 'test_remove.txt'...")
-    create_args = b''
-
-    # where_dir (fhandle3)
-    create_args += struct.pack('>I', len(root_handle))
-    create_args += root_handle
-    padding = (4 - (len(root_handle) % 4)) % 4
-    create_args += b'\x00' * padding
-
-    # name (filename3)
-    create_args += pack_string("test_remove.txt")
-
-    # how (createhow3) - UNCHECKED mode
-    create_args += struct.pack('>I', 0)  # mode = UNCHECKED
-
-    # sattr3 (attributes)
-    create_args += struct.pack('>I', 1)     # set_mode = SET_MODE
-    create_args += struct.pack('>I', 0o644) # mode value
-    create_args += struct.pack('>I', 0)     # set_uid = default
-    create_args += struct.pack('>I', 0)     # set_gid = default
-    create_args += struct.pack('>I', 0)     # set_size = default
-    create_args += struct.pack('>I', 0)     # set_atime = default
-    create_args += struct.pack('>I', 0)     # set_mtime = default
-
-    create_reply = rpc_call(host, port, 2, 100003, 3, 8, create_args)
+    # CREATE3args: where (fhandle3 + filename3) + createhow3
+    create_args = root_fh_xdr + _TEST_NAME_XDR + _CREATE_HOW
+
+    # Step 3/4 args are built now too: the server handles each connection's
+    # records strictly in order, so CREATE, REMOVE, and the verification
+    # LOOKUP can be pipelined back-to-back and their replies matched by XID —
+    # one round trip of latency instead of three.
+    remove_args = root_fh_xdr + _TEST_NAME_XDR
+    lookup_args = root_fh_xdr + _TEST_NAME_XDR
+
+    client.flush([
+        (2, 100003, 3, 8, create_args),
+        (3, 100003, 3, 12, remove_args),
+        (4, 100003, 3, 3, lookup_args),
+    ])
+
+    replies = {}
+    for _ in range(3):
+        reply = client.recv()
+        replies[U32.unpack_from(reply, 0)[0]] = reply
+
+    if set(replies) != {2, 3, 4}:
+        raise Exception(f"Unexpected reply XIDs: {sorted(replies)}")
+
+    create_reply = replies[2]
     offset = parse_rpc_reply(create_reply)
 
-    status = struct.unpack('>I', create_reply[offset:offset+4])[0]
+    status = U32.unpack_from(create_reply, offset)[0]
     if status != 0:
         raise Exception(f"CREATE failed with status {status}")
+    offset += 4
 
     print("  File created successfully")
 
-    # Step 3: REMOVE the file
-    print("\n3. Calling REMOVE to delete 'test_remove.txt'...")
-    remove_args = b''
-
-    # dir (fhandle3)
-    remove_args += struct.pack('>I', len(root_handle))
-    remove_args += root_handle
-    padding = (4 - (len(root_handle) % 4)) % 4
-    remove_args += b'\x00' * padding
-
-    # name (filename3)
-    remove_args += pack_string("test_remove.txt")
+    # CREATE3resok carries the new file's handle as a post_op_fh3; parse it
+    # rather than discarding the rest of the reply. REMOVE itself addresses
+    # by (dir, name), so the handle is only reported here.
+    handle_follows = U32.unpack_from(create_reply, offset)[0]
+    offset += 4
+    if handle_follows:
+        new_handle, offset = unpack_opaque_flex(create_reply, offset)
+        print(f"  CREATE returned file handle: {len(new_handle)} bytes")
 
-    remove_reply = rpc_call(host, port, 3, 100003, 3, 12, remove_args)
+    # Step 3: REMOVE the file
+    print("\n3. Parsing REMOVE reply for 'test_remove.txt'...")
+    remove_reply = replies[3]
     offset = parse_rpc_reply(remove_reply)
 
     # Parse REMOVE reply
-    status = struct.unpack('>I', remove_reply[offset:offset+4])[0]
+    status = U32.unpack_from(remove_reply, offset)[0]
     offset += 4
 
     if status != 0:
@@ -270,26 +202,17 @@ def test_remove(host, port):
 
     # Step 4: Verify file was removed by trying to LOOKUP
     print("\n4. Verifying file was removed (LOOKUP should fail)...")
-    lookup_args = b''
-
-    # dir (fhandle3)
-    lookup_args += struct.pack('>I', len(root_handle))
-    lookup_args += root_handle
-    padding = (4 - (len(root_handle) % 4)) % 4
-    lookup_args += b'\x00' * padding
-
-    # name (filename3)
-    lookup_args += pack_string("test_remove.txt")
-
-    lookup_reply = rpc_call(host, port, 4, 100003, 3, 3, lookup_args)
+    lookup_reply = replies[4]
     offset = parse_rpc_reply(lookup_reply)
 
-    status = struct.unpack('>I', lookup_reply[offset:offset+4])[0]
+    status = U32.unpack_from(lookup_reply, offset)[0]
     if status == 2:  # NFS3ERR_NOENT = 2
         print("  ✓ LOOKUP failed with NOENT - file was successfully removed")
     else:
         raise Exception(f"Expected NOENT (2), got status {status}")
 
+    client.close()
+
     print("\n✓ REMOVE test passed!")
 
 
@@ -297,38 +220,25 @@ def test_remove_nonexistent(host, port):
     """Test REMOVE on nonexistent file"""
     print("\n=== Test: REMOVE Nonexistent File ===")
 
-    # Step 1: Mount to get root file handle
-    print("\n1. Calling MOUNT...")
-    mount_args = pack_string("/tmp/nfs_exports")
-    mount_reply = rpc_call(host, port, 5, 100005, 3, 1, mount_args)
-    offset = parse_rpc_reply(mount_reply)
-
-    status = struct.unpack('>I', mount_reply[offset:offset+4])[0]
-    if status != 0:
-        raise Exception(f"MOUNT failed with status {status}")
-    offset += 4
+    # One persistent connection for every RPC in this test
+    client = RpcClient(host, port)
 
-    root_handle, offset = unpack_opaque_flex(mount_reply, offset)
+    # Step 1: Get root file handle (cached from the first subtest's MOUNT,
+    # so this normally costs no RPC at all)
+    print("\n1. Calling MOUNT...")
+    root_handle = get_root_handle(client, _EXPORT, 5)
     print(f"  Got root handle: {len(root_handle)} bytes")
 
     # Step 2: Try to REMOVE nonexistent file
     print("\n2. Trying to REMOVE nonexistent file 'does_not_exist.txt'...")
-    remove_args = b''
+    # REMOVE3args: dir (fhandle3) + name (filename3)
+    remove_args = pack_opaque(root_handle) + _NONEXISTENT_NAME_XDR
 
-    # dir (fhandle3)
-    remove_args += struct.pack('>I', len(root_handle))
-    remove_args += root_handle
-    padding = (4 - (len(root_handle) % 4)) % 4
-    remove_args += b'\x00' * padding
-
-    # name (filename3)
-    remove_args += pack_string("does_not_exist.txt")
-
-    remove_reply = rpc_call(host, port, 6, 100003, 3, 12, remove_args)
+    remove_reply = client.call(6, 100003, 3, 12, remove_args)
     offset = parse_rpc_reply(remove_reply)
 
     # Parse REMOVE reply
-    status = struct.unpack('>I', remove_reply[offset:offset+4])[0]
+    status = U32.unpack_from(remove_reply, offset)[0]
     offset += 4
 
     if status == 2:  # NFS3ERR_NOENT = 2
@@ -352,6 +262,8 @@ def test_remove_nonexistent(host, port):
         raise Exception(f"Response length mismatch: expected {expected_total}, got {len(remove_reply)}")
 
     print(f"  ✓ Response format validation passed (length={len(remove_reply)} bytes)")
+    client.close()
+
     print("\n✓ REMOVE nonexistent file test passed!")
 
 
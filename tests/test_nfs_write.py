@@ -11,93 +11,32 @@ This test validates:
 5. Test writing at different offsets
 """
 
-import socket
+import itertools
 import struct
 import sys
-import os
-
-
-def pack_string(s):
-    """Pack a string as XDR string"""
-    data = s.encode('utf-8')
-    length = len(data)
-    padding = (4 - (length % 4)) % 4
-    return struct.pack('>I', length) + data + b'\x00' * padding
-
-
-def unpack_opaque_flex(data, offset):
-    """Unpack variable-length opaque data (length + data)"""
-    length = struct.unpack('>I', data[offset:offset+4])[0]
-    opaque_data = data[offset+4:offset+4+length]
-    padding = (4 - (length % 4)) % 4
-    next_offset = offset + 4 + length + padding
-    return opaque_data, next_offset
-
-
-def rpc_call(host, port, xid, prog, vers, proc, args_data):
-    """Make an RPC call and return the response"""
-    # Build RPC call header
-    message = b''
-    message += struct.pack('>I', xid)      # XID
-    message += struct.pack('>I', 0)        # msg_type = CALL (0)
-    message += struct.pack('>I', 2)        # RPC version
-    message += struct.pack('>I', prog)     # Program
-    message += struct.pack('>I', vers)     # Version
-    message += struct.pack('>I', proc)     # Procedure
-    # cred (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-    # verf (AUTH_NONE)
-    message += struct.pack('>I', 0)        # flavor = AUTH_NONE
-    message += struct.pack('>I', 0)        # length = 0
-
-    # Add procedure arguments
-    call_msg = message + args_data
-
-    # Add RPC record marking
-    msg_len = len(call_msg)
-    record_header = struct.pack('>I', 0x80000000 | msg_len)
-
-    # Connect and send
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(5.0)
-    sock.connect((host, port))
-    sock.sendall(record_header + call_msg)
-
-    # Receive response
-    reply_header_bytes = sock.recv(4)
-    if len(reply_header_bytes) != 4:
-        sock.close()
-        raise Exception("Failed to read response header")
-
-    reply_header = struct.unpack('>I', reply_header_bytes)[0]
-    reply_len = reply_header & 0x7FFFFFFF
-
-    # Read response data
-    reply_data = b''
-    while len(reply_data) < reply_len:
-        chunk = sock.recv(reply_len - len(reply_data))
-        if not chunk:
-            break
-        reply_data += chunk
-
-    sock.close()
-    return reply_data
-
-
-def parse_rpc_reply(reply_data):
-    """Parse RPC reply header, return offset to result data"""
-    if len(reply_data) < 24:
-        raise Exception(f"Response too short: {len(reply_data)} bytes")
-
-    reply_xid, msg_type, reply_stat, verf_flavor, verf_len, accept_stat = struct.unpack(
-        '>IIIIII', reply_data[:24]
-    )
-
-    if reply_stat != 0 or accept_stat != 0:
-        raise Exception(f"RPC error: reply_stat={reply_stat}, accept_stat={accept_stat}")
-
-    return 24  # Return offset to procedure-specific data
+
+from _rpc import (RpcClient, U32, pack_opaque, pack_string, parse_rpc_reply,
+                  unpack_opaque_flex, vprint)
+
+# Precompiled struct formats (compiled once at import, reused every call)
+_WRITE_MID = struct.Struct('>QII')      # offset + count + stable_how
+_READ_TAIL = struct.Struct('>QI')       # offset + count
+
+# XDR-packed constants folded at import: the mount path and the test
+# filename never change between runs
+_MOUNT_ARGS = pack_string("/")
+_TEST_FILENAME = "test_write_file.txt"
+_TEST_FILENAME_XDR = pack_string(_TEST_FILENAME)
+
+# Monotonic XID allocator: hardcoded per-step constants would collide as
+# soon as the steps loop or run concurrently; itertools.count hands out
+# unique IDs with no syscall and no lock
+_XID = itertools.count(500001)
+
+
+def next_xid():
+    """Allocate the next RPC transaction id"""
+    return next(_XID) & 0xFFFFFFFF
 
 
 def test_nfs_write():
@@ -110,8 +49,12 @@ def test_nfs_write():
     host = "localhost"
     port = 4000
 
+    # One persistent connection for all six RPCs (per-call connects paid a
+    # TCP handshake + teardown each time)
+    client = RpcClient(host, port)
+
     # Test file
-    test_filename = "test_write_file.txt"
+    test_filename = _TEST_FILENAME
     test_data = b"Hello from NFS WRITE test!"
     print(f"Test file: {test_filename}")
     print(f"Test data: {test_data}")
@@ -120,13 +63,10 @@ def test_nfs_write():
     # Step 1: MOUNT
     print("Step 1: MOUNT /")
     print("-" * 60)
-    mount_xid = 500001
-    mount_args = pack_string("/")
-
-    reply_data = rpc_call(host, port, mount_xid, 100005, 3, 1, mount_args)
+    reply_data = client.call(next_xid(), 100005, 3, 1, _MOUNT_ARGS)
     offset = parse_rpc_reply(reply_data)
 
-    mount_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    mount_status = U32.unpack_from(reply_data, offset)[0]
     if mount_status != 0:
         print(f"  ✗ MOUNT failed with status {mount_status}")
         sys.exit(1)
@@ -138,19 +78,14 @@ def test_nfs_write():
     # Step 2: LOOKUP test file
     print(f"Step 2: LOOKUP {test_filename}")
     print("-" * 60)
-    lookup_xid = 500002
 
-    # LOOKUP3args
-    lookup_args = b''
-    lookup_args += struct.pack('>I', len(root_fhandle)) + root_fhandle
-    padding = (4 - (len(root_fhandle) % 4)) % 4
-    lookup_args += b'\x00' * padding
-    lookup_args += pack_string(test_filename)
+    # LOOKUP3args: dir (fhandle3) + name (filename3)
+    lookup_args = pack_opaque(root_fhandle) + _TEST_FILENAME_XDR
 
-    reply_data = rpc_call(host, port, lookup_xid, 100003, 3, 3, lookup_args)
+    reply_data = client.call(next_xid(), 100003, 3, 3, lookup_args)
     offset = parse_rpc_reply(reply_data)
 
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    nfs_status = U32.unpack_from(reply_data, offset)[0]
     if nfs_status != 0:
         print(f"  ⚠ LOOKUP failed with status {nfs_status} (file may not exist yet)")
         print(f"  Note: Make sure {test_filename} exists in /tmp/nfs_exports/")
@@ -160,41 +95,27 @@ def test_nfs_write():
     print(f"  ✓ Got file handle: {len(file_handle)} bytes")
     print()
 
+    # The handle prefixes every WRITE and READ below; pack it once
+    file_fh_xdr = pack_opaque(file_handle)
+
     # Step 3: WRITE data to file
     print("Step 3: WRITE data to file")
     print("-" * 60)
-    write_xid = 500003
-
-    # WRITE3args: file handle + offset + count + stable + data
-    write_args = b''
-
-    # File handle (variable-length opaque)
-    write_args += struct.pack('>I', len(file_handle)) + file_handle
-    padding = (4 - (len(file_handle) % 4)) % 4
-    write_args += b'\x00' * padding
-
-    # Offset (uint64) - write at beginning
-    write_args += struct.pack('>Q', 0)
 
-    # Count (uint32)
-    write_args += struct.pack('>I', len(test_data))
-
-    # Stable (enum stable_how): FILE_SYNC = 2
-    write_args += struct.pack('>I', 2)
-
-    # Data (variable-length opaque)
-    write_args += struct.pack('>I', len(test_data)) + test_data
-    data_padding = (4 - (len(test_data) % 4)) % 4
-    write_args += b'\x00' * data_padding
+    # WRITE3args: file handle + offset/count/stable (one pack, FILE_SYNC=2)
+    # + data as a variable-length opaque
+    write_args = (file_fh_xdr
+                  + _WRITE_MID.pack(0, len(test_data), 2)
+                  + pack_opaque(test_data))
 
     print(f"  Writing {len(test_data)} bytes at offset 0")
     print(f"  Data: {test_data}")
 
-    reply_data = rpc_call(host, port, write_xid, 100003, 3, 7, write_args)
+    reply_data = client.call(next_xid(), 100003, 3, 7, write_args)
     offset = parse_rpc_reply(reply_data)
 
     # Parse WRITE3res
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    nfs_status = U32.unpack_from(reply_data, offset)[0]
     print(f"  NFS status: {nfs_status} (0=NFS3_OK)")
 
     if nfs_status != 0:
@@ -206,25 +127,25 @@ def test_nfs_write():
     # Parse WRITE3resok
     # wcc_data: pre_op_attr (bool + optional) + post_op_attr (bool + optional)
     # pre_op_attr
-    pre_op_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    pre_op_follows = U32.unpack_from(reply_data, offset)[0]
     offset += 4
     if pre_op_follows:
         # Skip pre_op_attr (size3 + mtime + ctime = 24 bytes)
         offset += 24
 
     # post_op_attr
-    post_op_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    post_op_follows = U32.unpack_from(reply_data, offset)[0]
     offset += 4
     if post_op_follows:
         # Skip fattr3 (84 bytes)
         offset += 84
 
     # count (bytes written)
-    count = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    count = U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     # committed (stable_how)
-    committed = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    committed = U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     # verf (writeverf3 = 8 bytes)
@@ -239,20 +160,14 @@ def test_nfs_write():
     # Step 4: READ to verify written data
     print("Step 4: READ to verify written data")
     print("-" * 60)
-    read_xid = 500004
 
-    # READ3args: file handle + offset + count
-    read_args = b''
-    read_args += struct.pack('>I', len(file_handle)) + file_handle
-    padding = (4 - (len(file_handle) % 4)) % 4
-    read_args += b'\x00' * padding
-    read_args += struct.pack('>Q', 0)      # offset = 0
-    read_args += struct.pack('>I', 1024)   # count = 1024
+    # READ3args: file handle + offset (0) + count (1024)
+    read_args = file_fh_xdr + _READ_TAIL.pack(0, 1024)
 
-    reply_data = rpc_call(host, port, read_xid, 100003, 3, 6, read_args)
+    reply_data = client.call(next_xid(), 100003, 3, 6, read_args)
     offset = parse_rpc_reply(reply_data)
 
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    nfs_status = U32.unpack_from(reply_data, offset)[0]
     if nfs_status != 0:
         print(f"  ✗ READ failed with status {nfs_status}")
         sys.exit(1)
@@ -261,33 +176,34 @@ def test_nfs_write():
     offset += 4
 
     # Skip post_op_attr
-    attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    attr_follows = U32.unpack_from(reply_data, offset)[0]
     offset += 4
     if attr_follows:
         offset += 84  # Skip fattr3
 
     # count
-    read_count = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    read_count = U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
     # eof
-    eof = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    eof = U32.unpack_from(reply_data, offset)[0]
     offset += 4
 
-    # data
-    data_length = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    # data: compare through a zero-copy view — slicing out bytes just for
+    # the equality check would copy the whole payload first
+    data_length = U32.unpack_from(reply_data, offset)[0]
     offset += 4
-    read_data = reply_data[offset:offset+data_length]
+    read_view = memoryview(reply_data)[offset:offset+data_length]
 
     print(f"  Read {read_count} bytes")
-    print(f"  Data: {read_data}")
+    vprint(f"  Data: {bytes(read_view)}")
 
-    if read_data == test_data:
+    if read_view == test_data:
         print(f"  ✅ Verified: Data matches written content")
     else:
         print(f"  ✗ Data mismatch!")
         print(f"    Expected: {test_data}")
-        print(f"    Got:      {read_data}")
+        print(f"    Got:      {bytes(read_view)}")
         sys.exit(1)
 
     print()
@@ -295,89 +211,77 @@ def test_nfs_write():
     # Step 5: Test WRITE with offset
     print("Step 5: Test WRITE with offset (overwrite partial data)")
     print("-" * 60)
-    write_xid = 500005
 
     offset_data = b"UPDATED"
     write_offset = 6  # Overwrite " from" with "UPDATED"
 
-    write_args = b''
-    write_args += struct.pack('>I', len(file_handle)) + file_handle
-    padding = (4 - (len(file_handle) % 4)) % 4
-    write_args += b'\x00' * padding
-    write_args += struct.pack('>Q', write_offset)  # offset
-    write_args += struct.pack('>I', len(offset_data))  # count
-    write_args += struct.pack('>I', 2)  # stable = FILE_SYNC
-    write_args += struct.pack('>I', len(offset_data)) + offset_data
-    data_padding = (4 - (len(offset_data) % 4)) % 4
-    write_args += b'\x00' * data_padding
+    write_args = (file_fh_xdr
+                  + _WRITE_MID.pack(write_offset, len(offset_data), 2)
+                  + pack_opaque(offset_data))
 
     print(f"  Writing {len(offset_data)} bytes at offset {write_offset}")
     print(f"  Data: {offset_data}")
 
-    reply_data = rpc_call(host, port, write_xid, 100003, 3, 7, write_args)
+    reply_data = client.call(next_xid(), 100003, 3, 7, write_args)
     offset = parse_rpc_reply(reply_data)
 
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    nfs_status = U32.unpack_from(reply_data, offset)[0]
     if nfs_status != 0:
         print(f"  ✗ WRITE failed with status {nfs_status}")
         sys.exit(1)
 
     # Parse result (skip wcc_data)
     offset += 4
-    pre_op_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    pre_op_follows = U32.unpack_from(reply_data, offset)[0]
     offset += 4
     if pre_op_follows:
         offset += 24
-    post_op_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    post_op_follows = U32.unpack_from(reply_data, offset)[0]
     offset += 4
     if post_op_follows:
         offset += 84
 
-    count = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    count = U32.unpack_from(reply_data, offset)[0]
     print(f"  ✓ Wrote {count} bytes at offset {write_offset}")
     print()
 
     # Step 6: READ again to verify offset write
     print("Step 6: READ to verify offset write")
     print("-" * 60)
-    read_xid = 500006
 
-    read_args = b''
-    read_args += struct.pack('>I', len(file_handle)) + file_handle
-    padding = (4 - (len(file_handle) % 4)) % 4
-    read_args += b'\x00' * padding
-    read_args += struct.pack('>Q', 0)
-    read_args += struct.pack('>I', 1024)
+    read_args = file_fh_xdr + _READ_TAIL.pack(0, 1024)
 
-    reply_data = rpc_call(host, port, read_xid, 100003, 3, 6, read_args)
+    reply_data = client.call(next_xid(), 100003, 3, 6, read_args)
     offset = parse_rpc_reply(reply_data)
 
-    nfs_status = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    nfs_status = U32.unpack_from(reply_data, offset)[0]
     if nfs_status != 0:
         print(f"  ✗ READ failed with status {nfs_status}")
         sys.exit(1)
 
     # Skip to data
     offset += 4
-    attr_follows = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    attr_follows = U32.unpack_from(reply_data, offset)[0]
     offset += 4
     if attr_follows:
         offset += 84
     offset += 4  # count
     offset += 4  # eof
-    data_length = struct.unpack('>I', reply_data[offset:offset+4])[0]
+    data_length = U32.unpack_from(reply_data, offset)[0]
     offset += 4
-    final_data = reply_data[offset:offset+data_length]
+    final_view = memoryview(reply_data)[offset:offset+data_length]
 
     expected_final = test_data[:write_offset] + offset_data + test_data[write_offset+len(offset_data):]
-    print(f"  Read data: {final_data}")
-    print(f"  Expected:  {expected_final}")
+    vprint(f"  Read data: {bytes(final_view)}")
+    vprint(f"  Expected:  {expected_final}")
 
-    if final_data == expected_final:
+    if final_view == expected_final:
         print(f"  ✅ Verified: Offset write successful")
     else:
         print(f"  ✗ Data mismatch after offset write!")
 
+    client.close()
+
     print()
     print("=" * 60)
     print("✅ NFS WRITE test PASSED")
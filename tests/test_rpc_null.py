@@ -8,6 +8,35 @@ This script sends a simple RPC NULL procedure call and expects a success respons
 import socket
 import struct
 
+from _rpc import VERBOSE, vprint
+
+# Precompiled struct formats (compiled once at import, reused every call)
+_U32 = struct.Struct('!I')
+_REPLY4 = struct.Struct('!IIII')   # xid, reply_stat, verf flavor/length
+
+# Everything in the NULL call except the XID is constant: RPC version,
+# program, version, procedure, and the AUTH_NONE cred/verf fold into one
+# tail packed at import
+_NULL_TAIL = struct.pack('!8I', 2, 100003, 3, 0, 0, 0, 0, 0)
+
+
+def _recv_exact(sock, length):
+    """Drain exactly length bytes from sock.
+
+    recv() may legally return fewer bytes than asked for; treating a short
+    read as an error mis-reports healthy replies that arrive in pieces.
+    """
+    buf = bytearray(length)
+    mv = memoryview(buf)
+    got = 0
+    while got < length:
+        n = sock.recv_into(mv[got:])
+        if not n:
+            raise Exception(f"Connection closed after {got}/{length} bytes")
+        got += n
+    return bytes(buf)
+
+
 def send_rpc_null_call(host='localhost', port=4000):
     """Send an RPC NULL call and verify the response"""
 
@@ -23,65 +52,51 @@ def send_rpc_null_call(host='localhost', port=4000):
     # };
 
     xid = 12345
-    rpcvers = 2
     prog = 100003  # NFS program number
     vers = 3       # NFSv3
     proc = 0       # NULL procedure
 
-    # Build the message
-    message = b''
-    message += struct.pack('!I', xid)      # XID
-    message += struct.pack('!I', rpcvers)  # RPC version
-    message += struct.pack('!I', prog)     # Program number
-    message += struct.pack('!I', vers)     # Program version
-    message += struct.pack('!I', proc)     # Procedure number
-
-    # cred (AUTH_NONE)
-    message += struct.pack('!I', 0)  # flavor = AUTH_NONE
-    message += struct.pack('!I', 0)  # length = 0
-
-    # verf (AUTH_NONE)
-    message += struct.pack('!I', 0)  # flavor = AUTH_NONE
-    message += struct.pack('!I', 0)  # length = 0
+    # Build the message: stamp the XID onto the constant tail
+    message = _U32.pack(xid) + _NULL_TAIL
 
     print(f"Sending RPC NULL call to {host}:{port}")
-    print(f"  XID: {xid}")
-    print(f"  Program: {prog}, Version: {vers}, Procedure: {proc}")
-    print(f"  Message size: {len(message)} bytes")
-    print(f"  Message (hex): {message.hex()}")
+    vprint(f"  XID: {xid}")
+    vprint(f"  Program: {prog}, Version: {vers}, Procedure: {proc}")
+    vprint(f"  Message size: {len(message)} bytes")
+    # hex() walks every byte and allocates a string twice the buffer size;
+    # only pay that when someone is actually looking
+    if VERBOSE:
+        print(f"  Message (hex): {message.hex()}")
 
     # Connect to server
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Latency-sensitive request/reply: don't let Nagle hold the frames back
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     try:
         sock.connect((host, port))
 
-        # Send with RPC record marking
+        # Send with RPC record marking in one write (two send() calls meant
+        # two syscalls and possibly two segments for a 44-byte request)
         # Format: [last_fragment:1bit][length:31bits]
         fragment_header = 0x80000000 | len(message)  # last=true
-        sock.send(struct.pack('!I', fragment_header))
-        sock.send(message)
+        sock.sendall(_U32.pack(fragment_header) + message)
 
         print("\nWaiting for response...")
 
         # Read response fragment header
-        response_header = sock.recv(4)
-        if len(response_header) != 4:
-            print(f"ERROR: Failed to read response header")
-            return False
+        response_header = _recv_exact(sock, 4)
 
-        resp_fragment = struct.unpack('!I', response_header)[0]
+        resp_fragment = _U32.unpack_from(response_header, 0)[0]
         resp_is_last = (resp_fragment & 0x80000000) != 0
         resp_length = resp_fragment & 0x7FFFFFFF
 
-        print(f"Response fragment: last={resp_is_last}, length={resp_length}")
+        vprint(f"Response fragment: last={resp_is_last}, length={resp_length}")
 
         # Read response body
-        response = sock.recv(resp_length)
-        if len(response) != resp_length:
-            print(f"ERROR: Expected {resp_length} bytes, got {len(response)}")
-            return False
+        response = _recv_exact(sock, resp_length)
 
-        print(f"Response (hex): {response.hex()}")
+        if VERBOSE:
+            print(f"Response (hex): {response.hex()}")
 
         # Parse response
         # Format: [xid][reply_stat][verf][accept_stat]
@@ -89,20 +104,18 @@ def send_rpc_null_call(host='localhost', port=4000):
             print(f"ERROR: Response too short: {len(response)} bytes")
             return False
 
-        resp_xid = struct.unpack('!I', response[0:4])[0]
-        reply_stat = struct.unpack('!I', response[4:8])[0]
-        verf_flavor = struct.unpack('!I', response[8:12])[0]
-        verf_len = struct.unpack('!I', response[12:16])[0]
+        resp_xid, reply_stat, verf_flavor, verf_len = \
+            _REPLY4.unpack_from(response, 0)
 
-        print(f"\nParsed response:")
-        print(f"  XID: {resp_xid} (expected {xid})")
-        print(f"  Reply stat: {reply_stat} (0=MSG_ACCEPTED)")
-        print(f"  Verf flavor: {verf_flavor} (0=AUTH_NONE)")
-        print(f"  Verf length: {verf_len}")
+        vprint(f"\nParsed response:")
+        vprint(f"  XID: {resp_xid} (expected {xid})")
+        vprint(f"  Reply stat: {reply_stat} (0=MSG_ACCEPTED)")
+        vprint(f"  Verf flavor: {verf_flavor} (0=AUTH_NONE)")
+        vprint(f"  Verf length: {verf_len}")
 
         if verf_len == 0 and len(response) >= 20:
-            accept_stat = struct.unpack('!I', response[16:20])[0]
-            print(f"  Accept stat: {accept_stat} (0=SUCCESS)")
+            accept_stat = _U32.unpack_from(response, 16)[0]
+            vprint(f"  Accept stat: {accept_stat} (0=SUCCESS)")
 
             if resp_xid == xid and reply_stat == 0 and accept_stat == 0:
                 print("\n✅ RPC NULL call succeeded!")